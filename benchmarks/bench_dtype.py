@@ -0,0 +1,67 @@
+"""Compare the float32 and float64 data type policies on a realistic (100x100 pixel, full sector) cutout.
+
+Usage:
+    python benchmarks/bench_dtype.py [--size 100] [--cadences 1300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tess_cpm  # noqa: E402
+from synthetic import make_tesscut_file  # noqa: E402
+
+
+def detrend(path, dtype, aperture_halfwidth, n, k):
+    s = tess_cpm.Source(path, verbose=False, dtype=dtype)
+    center = s.cutout_data.cutout_sidelength_x // 2
+    lims = [center - aperture_halfwidth, center + aperture_halfwidth]
+    s.set_aperture(rowlims=lims, collims=lims)
+    s.add_cpm_model(n=n)
+    s.add_poly_model()
+    s.set_regs([0.1, 0.1])
+    s.holdout_fit_predict(k=k)
+    return s.get_aperture_lc(data_type="rescaled_cpm_subtracted_flux", verbose=False)
+
+
+def run(path, dtype, aperture_halfwidth=2, n=256, k=10):
+    # The peak memory is measured in a separate run, since the per-allocation overhead of tracemalloc would
+    # inflate the timing and hide the difference between the policies. It runs first, which also does the lazy imports.
+    tracemalloc.start()
+    detrend(path, dtype, aperture_halfwidth, n, k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    lc = detrend(path, dtype, aperture_halfwidth, n, k)
+    elapsed = time.perf_counter() - start
+    num_pixels = (2 * aperture_halfwidth + 1) ** 2
+    return {"time": elapsed, "pixels_per_second": num_pixels / elapsed, "peak_mb": peak / 1e6, "lc": lc}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--cadences", type=int, default=1300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_tesscut_file(directory, size=args.size, num_cadences=args.cadences)
+        results = {name: run(path, dtype) for name, dtype in [("float64", np.float64), ("float32", np.float32)]}
+
+    for name, result in results.items():
+        print(f"{name}: {result['time']:.2f} s, {result['pixels_per_second']:.1f} pixels/s, "
+              f"peak traced memory {result['peak_mb']:.1f} MB")
+    lc64, lc32 = results["float64"]["lc"], results["float32"]["lc"]
+    diff = lc32 - lc64
+    print(f"Aperture light curve difference (float32 - float64): max |diff| = {np.max(np.abs(diff)):.3e}, "
+          f"rms = {np.sqrt(np.mean(diff ** 2)):.3e}, relative to rms scatter {np.std(lc64):.3e}")
+
+
+if __name__ == "__main__":
+    main()
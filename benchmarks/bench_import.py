@@ -0,0 +1,56 @@
+"""Measure the time it takes to ``import tess_cpm`` and check that no heavy dependency is loaded at import time.
+
+Each import runs in a fresh interpreter. Exits with a nonzero status if a heavy module is imported
+or if the median import time exceeds ``--budget`` (in seconds).
+
+Usage:
+    python benchmarks/bench_import.py [--repeat 5] [--budget 0.5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+HEAVY_MODULES = ("matplotlib", "lightkurve", "astroquery", "sklearn", "scipy", "astropy.wcs")
+
+SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import tess_cpm
+elapsed = time.perf_counter() - start
+print(json.dumps({"time": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None)
+    args = parser.parse_args()
+
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times, loaded = [], set()
+    for _ in range(args.repeat):
+        output = subprocess.run([sys.executable, "-c", SNIPPET], cwd=repo, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result["time"])
+        loaded.update(result["loaded"])
+
+    median = np.median(times)
+    print(f"import tess_cpm: median {median * 1e3:.1f} ms, min {min(times) * 1e3:.1f} ms over {args.repeat} runs")
+    failed = False
+    if loaded:
+        print(f"Heavy modules loaded at import time: {', '.join(sorted(loaded))}")
+        failed = True
+    if args.budget is not None and median > args.budget:
+        print(f"Import time exceeds the budget of {args.budget * 1e3:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare per-pixel and shared (aperture-level) predictor pixels across aperture sizes.
+
+For each aperture size, the holdout fit is timed with every pixel choosing its own predictor pixels and with one
+shared set of predictors for the whole aperture (``Source.add_cpm_model(shared=True)``). The accuracy of the shared
+predictors is reported as the RMS difference between the two aperture light curves, the point-to-point scatter of
+each light curve, and the fraction of the injected transit depth (see ``synthetic.make_tesscut_file``) they recover.
+
+Usage:
+    python benchmarks/bench_shared_predictors.py [--size 100] [--cadences 1300] [--halfwidths 1 2 4 6]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tess_cpm  # noqa: E402
+from synthetic import make_tesscut_file  # noqa: E402
+
+# The first cadence and the transit period of ``make_tesscut_file``'s defaults.
+TRANSIT_START = 1500.0
+TRANSIT_PERIOD = 3.0
+TRANSIT_DEPTH = 0.01
+
+
+def run(path, halfwidth, shared, n=256, k=10):
+    s = tess_cpm.Source(path, verbose=False)
+    center = s.cutout_data.cutout_sidelength_x // 2
+    lims = [center - halfwidth, center + halfwidth]
+    start = time.perf_counter()
+    s.set_aperture(rowlims=lims, collims=lims)
+    s.add_cpm_model(n=n, shared=shared)
+    s.add_poly_model()
+    s.set_regs([0.1, 0.1])
+    s.holdout_fit_predict(k=k)
+    elapsed = time.perf_counter() - start
+    lc = s.get_aperture_lc(data_type="rescaled_cpm_subtracted_flux", verbose=False)
+
+    in_transit = ((s.time - TRANSIT_START) % TRANSIT_PERIOD) < 0.02 * TRANSIT_PERIOD
+    # The transit is only injected into the central 3x3 pixels.
+    injected = TRANSIT_DEPTH * np.sum(s.cutout_data.flux_medians[center - 1 : center + 2, center - 1 : center + 2])
+    out_of_transit = lc[~in_transit]
+    return {
+        "time": elapsed,
+        "lc": lc,
+        "depth_fraction": (np.mean(out_of_transit) - np.mean(lc[in_transit])) / injected,
+        "scatter_ppm": 1e6 * np.std(np.diff(out_of_transit)) / np.sqrt(2) / np.median(out_of_transit),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--cadences", type=int, default=1300)
+    parser.add_argument("--halfwidths", type=int, nargs="+", default=[1, 2, 4, 6])
+    parser.add_argument("--n", type=int, default=256, help="Number of predictor pixels.")
+    parser.add_argument("--k", type=int, default=10, help="Number of holdout sections.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_tesscut_file(directory, size=args.size, num_cadences=args.cadences, transit_depth=TRANSIT_DEPTH,
+                                 transit_period=TRANSIT_PERIOD)
+        print(f"{'pixels':>6} {'per-pixel s':>11} {'shared s':>9} {'speedup':>7} {'rms diff':>9} "
+              f"{'scatter ppm (per-pixel/shared)':>31} {'depth fraction (per-pixel/shared)':>34}")
+        for halfwidth in args.halfwidths:
+            per_pixel = run(path, halfwidth, False, args.n, args.k)
+            shared = run(path, halfwidth, True, args.n, args.k)
+            diff = shared["lc"] - per_pixel["lc"]
+            rms = np.sqrt(np.mean(diff ** 2)) / np.std(per_pixel["lc"])
+            print(f"{(2 * halfwidth + 1) ** 2:>6} {per_pixel['time']:>11.2f} {shared['time']:>9.2f} "
+                  f"{per_pixel['time'] / shared['time']:>7.1f} {rms:>9.3f} "
+                  f"{per_pixel['scatter_ppm']:>15.0f} / {shared['scatter_ppm']:<13.0f} "
+                  f"{per_pixel['depth_fraction']:>17.3f} / {shared['depth_fraction']:<14.3f}")
+    print("rms diff: RMS of the aperture light curve difference relative to the per-pixel light curve's scatter.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Time the hot paths of tess_cpm on a synthetic TessCut cutout.
+
+Each benchmark is run ``--repeat`` times and the median wall time is reported together with a throughput
+(work units per second) and the peak memory traced by ``tracemalloc`` (measured in one extra run, since tracing
+slows the code down). The results, the parameters and the git commit are written to a JSON file so that runs
+can be compared across commits with ``--compare``.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--size 100] [--cadences 1300] [--repeat 3] [--output results.json]
+    python benchmarks/run_benchmarks.py --only fit holdout_fit_predict --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tess_cpm  # noqa: E402
+from synthetic import make_tesscut_file  # noqa: E402
+
+
+def _targets(size, num_targets):
+    # A square grid of targets centered on the cutout.
+    side = int(np.ceil(np.sqrt(num_targets)))
+    start = size // 2 - side // 2
+    rows, cols = np.meshgrid(np.arange(start, start + side), np.arange(start, start + side), indexing="ij")
+    return list(zip(rows.ravel()[:num_targets].tolist(), cols.ravel()[:num_targets].tolist()))
+
+
+def _aperture_source(path, halfwidth, n, poly=True, chunk_size=None, shared=False):
+    s = tess_cpm.Source(path, verbose=False, memmap=chunk_size is not None)
+    center = s.cutout_data.cutout_sidelength_x // 2
+    s.set_aperture(rowlims=[center - halfwidth, center + halfwidth], collims=[center - halfwidth, center + halfwidth],
+                   chunk_size=chunk_size)
+    s.add_cpm_model(n=n, shared=shared)
+    if poly:
+        s.add_poly_model()
+    s.set_regs([0.1, 0.1] if poly else [0.1])
+    return s
+
+
+def bench_load(path, args):
+    def run():
+        tess_cpm.CutoutData(path, verbose=False)
+    return run, args.size ** 2, "pixels"
+
+
+def _bench_load_background(estimator):
+    def bench(path, args):
+        def run():
+            tess_cpm.CutoutData(path, verbose=False, bkg_subtract=estimator())
+        return run, args.size ** 2, "pixels"
+    return bench
+
+
+def _bench_predictors(method):
+    def bench(path, args):
+        cutout_data = tess_cpm.CutoutData(path, verbose=False)
+        targets = _targets(args.size, args.targets)
+
+        def run():
+            for row, col in targets:
+                cpm = tess_cpm.CPM(cutout_data)
+                cpm.set_target(row, col)
+                cpm.set_exclusion(5)
+                cpm.set_predictor_pixels(args.n, method=method, seed=0)
+        return run, len(targets), "targets"
+    return bench
+
+
+def bench_fit(path, args):
+    cutout_data = tess_cpm.CutoutData(path, verbose=False)
+    models = []
+    for row, col in _targets(args.size, args.targets):
+        model = tess_cpm.PixelModel(cutout_data, row, col)
+        model.add_cpm_model(n=args.n)
+        model.add_poly_model()
+        model.set_regs([0.1, 0.1], verbose=False)
+        models.append(model)
+
+    def run():
+        for model in models:
+            model.fit(y=model.norm_flux, m=model.design_matrix, verbose=False)
+    return run, len(models), "fits"
+
+
+def bench_holdout_fit_predict(path, args):
+    s = _aperture_source(path, args.halfwidth, args.n)
+
+    def run():
+        s.holdout_fit_predict(k=args.k)
+    return run, len(s.models) * len(s.models[0]), "pixels"
+
+
+def bench_holdout_fit_predict_chunked(path, args):
+    s = _aperture_source(path, args.halfwidth, args.n, chunk_size=args.chunk_size)
+
+    def run():
+        s.holdout_fit_predict(k=args.k)
+    return run, len(s.models) * len(s.models[0]), "pixels"
+
+
+def bench_holdout_fit_predict_shared(path, args):
+    s = _aperture_source(path, args.halfwidth, args.n, shared=True)
+
+    def run():
+        s.holdout_fit_predict(k=args.k)
+    return run, len(s.models) * len(s.models[0]), "pixels"
+
+
+def bench_get_aperture_lc(path, args):
+    s = _aperture_source(path, args.halfwidth, args.n)
+    s.holdout_fit_predict(k=args.k)
+    num_calls = 100
+
+    def run():
+        for _ in range(num_calls):
+            s.get_aperture_lc(data_type="cpm_subtracted_flux", verbose=False)
+            s.get_aperture_lc(data_type="cpm_subtracted_flux", split=True, verbose=False)
+    return run, 2 * num_calls, "calls"
+
+
+def bench_calc_min_cpm_reg(path, args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # ``calc_min_cpm_reg`` sets a single (CPM) regularization value.
+    s = _aperture_source(path, 1, args.n, poly=False)
+    cpm_regs = np.logspace(-2, 2, args.num_regs)
+
+    def run():
+        s.calc_min_cpm_reg(cpm_regs, args.k)
+        plt.close("all")
+    return run, cpm_regs.size, "regs"
+
+
+BENCHMARKS = {
+    "load": bench_load,
+    "load_background_faintest": _bench_load_background(tess_cpm.FaintestPixelsBackground),
+    "load_background_percentile": _bench_load_background(tess_cpm.PercentileBackground),
+    "predictors_similar_brightness": _bench_predictors("similar_brightness"),
+    "predictors_cosine_similarity": _bench_predictors("cosine_similarity"),
+    "predictors_random": _bench_predictors("random"),
+    "fit": bench_fit,
+    "holdout_fit_predict": bench_holdout_fit_predict,
+    "holdout_fit_predict_chunked": bench_holdout_fit_predict_chunked,
+    "holdout_fit_predict_shared": bench_holdout_fit_predict_shared,
+    "get_aperture_lc": bench_get_aperture_lc,
+    "calc_min_cpm_reg": bench_calc_min_cpm_reg,
+}
+
+
+def measure(bench, path, args):
+    run, units, unit_name = bench(path, args)
+    run()  # Warm up (e.g., lazily computed attributes and caches).
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = float(np.median(times))
+    return {
+        "median_s": median, "min_s": float(np.min(times)), "units": units, "unit_name": unit_name,
+        "throughput": units / median, "peak_mb": peak / 1e6,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100, help="Cutout sidelength in pixels.")
+    parser.add_argument("--cadences", type=int, default=1300)
+    parser.add_argument("--nan-fraction", type=float, default=0.01, help="Fraction of pixels that are all NaN.")
+    parser.add_argument("--bad-quality-fraction", type=float, default=0.05)
+    parser.add_argument("--n", type=int, default=256, help="Number of predictor pixels.")
+    parser.add_argument("--k", type=int, default=10, help="Number of holdout sections.")
+    parser.add_argument("--targets", type=int, default=25, help="Number of target pixels for the per-pixel benchmarks.")
+    parser.add_argument("--halfwidth", type=int, default=2, help="Aperture half-width for the Source benchmarks.")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Cadences per chunk for the chunked benchmarks.")
+    parser.add_argument("--num-regs", type=int, default=5, help="Number of regularization values for calc_min_cpm_reg.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Only run these benchmarks.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A JSON file from a previous run to compare against.")
+    args = parser.parse_args()
+
+    params = {key: getattr(args, key) for key in
+              ("size", "cadences", "nan_fraction", "bad_quality_fraction", "n", "k", "targets", "halfwidth",
+               "chunk_size", "num_regs")}
+    report = {
+        "commit": _git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+        "machine": platform.machine(), "params": params, "results": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_tesscut_file(directory, size=args.size, num_cadences=args.cadences, nan_fraction=args.nan_fraction,
+                                 bad_quality_fraction=args.bad_quality_fraction)
+        for name in args.only or BENCHMARKS:
+            result = measure(BENCHMARKS[name], path, args)
+            report["results"][name] = result
+            print(f"{name:32s} {result['median_s']:9.4f} s  {result['throughput']:10.1f} {result['unit_name']}/s"
+                  f"  peak {result['peak_mb']:8.1f} MB")
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["params"] != params:
+            print("Warning: the baseline was run with different parameters.")
+        print(f"\nCompared to {args.compare} (commit {baseline.get('commit')}): time ratio (< 1 is faster)")
+        for name, result in report["results"].items():
+            if name in baseline["results"]:
+                ratio = result["median_s"] / baseline["results"][name]["median_s"]
+                print(f"{name:32s} {ratio:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
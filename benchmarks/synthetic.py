@@ -0,0 +1,77 @@
+"""Synthetic TESS cutouts for benchmarking.
+
+The files follow the TessCut format read by ``tess_cpm.CutoutData``: a binary table extension 
+with ``TIME``, ``FLUX``, ``FLUX_ERR`` and ``QUALITY`` columns, an image extension for the WCS, 
+and a file name of the form ``tess-s0010-1-1_..._astrocut.fits``.
+"""
+import os
+import numpy as np
+from astropy.io import fits
+
+
+def make_tesscut_file(directory, size=100, num_cadences=1300, nan_fraction=0.0, 
+                      bad_quality_fraction=0.05, sector=10, seed=42, transit_depth=0.01, transit_period=3.0):
+    """Write a synthetic TessCut-format cutout and return its path.
+
+    The pixel light curves are a per-pixel mix of a few shared systematic trends (which CPM should remove) 
+    plus white noise. A transient-like bump and a periodic box-shaped transit are injected into the central pixels.
+
+    Args:
+        directory (str): The directory to write the file into.
+        size (int): The cutout sidelength in pixels.
+        num_cadences (int): The number of cadences (about 1300 for a 30-minute cadence sector).
+        nan_fraction (float): The fraction of pixels whose light curves are entirely NaN.
+        bad_quality_fraction (float): The fraction of cadences with a nonzero ``QUALITY`` flag.
+        sector (int): The sector number used in the file name.
+        seed (int): The random seed.
+        transit_depth (float): The fractional depth of the injected transits. Set to 0 to inject none.
+        transit_period (float): The period of the injected transits in days. Each transit lasts 2% of the period.
+    """
+    rng = np.random.default_rng(seed)
+    time = np.linspace(1500.0, 1527.0, num_cadences)
+    phase = (time - time[0]) / (time[-1] - time[0])
+
+    trends = np.vstack([
+        np.sin(2 * np.pi * phase * 7) * 0.01,
+        (phase - 0.5) ** 2 * 0.05,
+        np.exp(-phase * 20) * 0.02,
+        np.cos(2 * np.pi * phase * 23) * 0.003,
+    ])
+    medians = rng.lognormal(5, 1, (size, size))
+    weights = rng.normal(1, 0.3, (trends.shape[0], size, size))
+    relative = np.tensordot(trends, weights, axes=(0, 0))
+    relative += rng.normal(0, 0.002, relative.shape)
+
+    center = size // 2
+    bump = 0.05 * np.exp(-0.5 * ((time - time.mean()) / 0.5) ** 2)
+    transit = -transit_depth * (((time - time[0]) % transit_period) < 0.02 * transit_period)
+    relative[:, center - 1 : center + 2, center - 1 : center + 2] += (bump + transit)[:, None, None]
+
+    flux = (medians * (1 + relative)).astype(np.float32)
+    flux_err = np.sqrt(np.abs(flux)).astype(np.float32)
+    nan_pixels = rng.random((size, size)) < nan_fraction
+    flux[:, nan_pixels] = np.nan
+    flux_err[:, nan_pixels] = np.nan
+
+    quality = np.zeros(num_cadences, dtype=np.int32)
+    quality[rng.random(num_cadences) < bad_quality_fraction] = 128
+
+    columns = [
+        fits.Column(name="TIME", format="D", array=time),
+        fits.Column(name="FLUX", format=f"{size * size}E", dim=f"({size},{size})", array=flux),
+        fits.Column(name="FLUX_ERR", format=f"{size * size}E", dim=f"({size},{size})", array=flux_err),
+        fits.Column(name="QUALITY", format="J", array=quality),
+    ]
+    wcs_header = fits.Header()
+    wcs_header["CTYPE1"], wcs_header["CTYPE2"] = "RA---TAN", "DEC--TAN"
+    wcs_header["CRVAL1"], wcs_header["CRVAL2"] = 10.0, 20.0
+    wcs_header["CRPIX1"], wcs_header["CRPIX2"] = center, center
+    wcs_header["CDELT1"], wcs_header["CDELT2"] = -0.0058, 0.0058
+    hdul = fits.HDUList([
+        fits.PrimaryHDU(),
+        fits.BinTableHDU.from_columns(columns),
+        fits.ImageHDU(np.zeros((size, size), dtype=np.int32), header=wcs_header),
+    ])
+    path = os.path.join(directory, f"tess-s{sector:04d}-1-1_10.000000_20.000000_{size}x{size}_astrocut.fits")
+    hdul.writeto(path, overwrite=True)
+    return path
@@ -20,7 +20,9 @@ setuptools.setup(
         "scipy",
         "astropy",
         "astroquery",
-        "scikit-learn",
         "lightkurve"
-    ]
+    ],
+    entry_points={
+        "console_scripts": ["tess-cpm-pipeline=tess_cpm.pipeline:main"],
+    },
 )
@@ -1,6 +1,12 @@
 from .cutout_data import *
+from .background import *
+from .cutout_cache import *
+from .result_cache import *
 from .utils import *
 from .source import *
 from .model import *
 from .poly_model import *
-from .cpm_model import *
\ No newline at end of file
+from .cpm_model import *
+from .result_store import *
+from .outliers import *
+from . import instrumentation
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class FaintestPixelsBackground(object):
+    """Estimate the background as the median light curve of the faintest pixels in the cutout.
+
+    Args:
+        n (Optional[int]): The number of faintest pixels (by median flux) to use.
+        chunk_size (Optional[int]): The number of cadences to process at a time.
+            The default is set by ``CutoutData.chunk_bytes``.
+    """
+
+    def __init__(self, n=100, chunk_size=None):
+        self.n = n
+        self.chunk_size = chunk_size
+        self.pixel_locations = None
+
+    def estimate(self, cutout_data):
+        """Compute the background of each (good) cadence of a ``CutoutData`` object that is not yet background subtracted.
+
+        Returns:
+            The background estimate (time,).
+        """
+        flux_medians = cutout_data._flux_medians()
+        self.pixel_locations = np.unravel_index(
+            np.argpartition(flux_medians.ravel(), self.n)[:self.n], flux_medians.shape
+        )
+        bkg_estimate = np.empty(cutout_data.time.size)
+        for start, stop, frames in cutout_data._iter_raw_flux_frames(self.chunk_size):
+            bkg_estimate[start:stop] = np.nanmedian(frames[:, self.pixel_locations[0], self.pixel_locations[1]], axis=1)
+        return bkg_estimate
+
+
+class PercentileBackground(object):
+    """Estimate the background of each cadence as a percentile of the flux over a (masked) grid of pixels.
+
+    Args:
+        percentile (Optional[float]): The percentile (between 0 and 100) of the pixel fluxes in each cadence.
+        mask (Optional[array]): Boolean array (rows, cols). Only pixels where ``mask`` is ``True`` are used,
+            e.g., to exclude the target and bright stars. Default is every pixel.
+        step (Optional[int]): Only use every ``step``-th row and column of the cutout.
+            A coarser grid makes the estimate cheaper for large cutouts (e.g., eleanor postcards).
+        chunk_size (Optional[int]): The number of cadences to process at a time.
+            The default is set by ``CutoutData.chunk_bytes``.
+    """
+
+    def __init__(self, percentile=10, mask=None, step=1, chunk_size=None):
+        self.percentile = percentile
+        self.mask = mask
+        self.step = step
+        self.chunk_size = chunk_size
+        self.pixel_locations = None
+
+    def estimate(self, cutout_data):
+        """Compute the background of each (good) cadence of a ``CutoutData`` object that is not yet background subtracted.
+
+        Returns:
+            The background estimate (time,).
+        """
+        shape = (cutout_data.cutout_sidelength_x, cutout_data.cutout_sidelength_y)
+        grid = np.full(shape, False)
+        grid[::self.step, ::self.step] = True
+        if self.mask is not None:
+            grid &= self.mask
+        self.pixel_locations = np.nonzero(grid)
+        bkg_estimate = np.empty(cutout_data.time.size)
+        for start, stop, frames in cutout_data._iter_raw_flux_frames(self.chunk_size):
+            bkg_estimate[start:stop] = np.nanpercentile(
+                frames[:, self.pixel_locations[0], self.pixel_locations[1]], self.percentile, axis=1
+            )
+        return bkg_estimate
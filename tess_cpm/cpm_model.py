@@ -1,12 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import lightkurve as lk
-from astropy.io import fits
-from astropy.wcs import WCS
-from sklearn.model_selection import KFold
 
-
-from .utils import summary_plot
 from .cutout_data import CutoutData
 
 
@@ -41,11 +34,10 @@ class CPM(object):
         self.num_predictor_pixels = None
         self.locations_predictor_pixels = None
         self.mask_predictor_pixels = None
-        self.predictor_pixels_fluxes = None
         self.normalized_predictor_pixels_fluxes = None
 
         self.reg = None
-        self.reg_matrix = None
+        self.reg_vector = None
         self.m = None
         self.params = None
         self.prediction = None
@@ -63,17 +55,17 @@ class CPM(object):
         """
         self.target_row = target_row
         self.target_col = target_col
-        self.target_fluxes = self.cutout_data.fluxes[:, target_row, target_col]
-        self.target_errors = self.cutout_data.flux_errors[:, target_row, target_col]
+        self.target_fluxes = self.cutout_data.get_pixel_data("fluxes", target_row, target_col)
+        self.target_errors = self.cutout_data.get_pixel_data("flux_errors", target_row, target_col)
         self.target_median = self.cutout_data.flux_medians[target_row, target_col]
-        self.normalized_target_fluxes = self.cutout_data.normalized_fluxes[
-            :, target_row, target_col
-        ]
-        self.normalized_target_flux_errors = self.cutout_data.normalized_flux_errors[
-            :, target_row, target_col
-        ]
-
-        mask = np.full(self.cutout_data.fluxes[0].shape, False)
+        self.normalized_target_fluxes = self.cutout_data.get_pixel_data(
+            "normalized_fluxes", target_row, target_col
+        )
+        self.normalized_target_flux_errors = self.cutout_data.get_pixel_data(
+            "normalized_flux_errors", target_row, target_col
+        )
+
+        mask = np.full(self.cutout_data.flux_medians.shape, False)
         mask[target_row, target_col] = 1
         self.mask_target_pixel = mask
         self.is_target_set = True
@@ -106,7 +98,7 @@ class CPM(object):
         sidelength_y = self.cutout_data.cutout_sidelength_y
         
 
-        excluded_pixels = np.full(self.cutout_data.fluxes[0].shape, False)
+        excluded_pixels = np.full(self.cutout_data.flux_medians.shape, False)
         if method == "closest":
             excluded_pixels[
                 max(0, r - exclusion_size) : min(r + exclusion_size + 1, sidelength_x),
@@ -129,9 +121,10 @@ class CPM(object):
             ] = True
 
         self.mask_excluded_pixels = excluded_pixels
+        self.method_exclusion = method
         self.is_exclusion_set = True
 
-    def set_predictor_pixels(self, n=256, method="similar_brightness", seed=None):
+    def set_predictor_pixels(self, n=256, method="similar_brightness", seed=None, predictor_idx=None, load=True):
         """Set the predictor pixels (features) used to perform CPM.
         
         CPM attempts to fit to the target pixel's light curve using the linear combination
@@ -154,6 +147,10 @@ class CPM(object):
                     is not ideal (default). 
             seed (Optional[int]): The seed passed to ``np.random.seed`` to be able to reproduce predictor pixels using 
                 the "random" method. The other methods are deterministic and are always reproducible.
+            predictor_idx (Optional[array]): The (flattened) indices of ``n`` predictor pixels that were already chosen
+                with ``method``, e.g., by ``CutoutData.get_predictor_idx``. If passed, the selection step is skipped.
+            load (Optional[bool]): If ``False``, the predictor pixels' light curves are not loaded and ``m`` is not set.
+                Rows of the design matrix are then read from the cutout when needed with ``get_m``.
         """
 
         if seed != None:
@@ -165,6 +162,9 @@ class CPM(object):
 
         self.method_choose_predictor_pixels = method
         self.num_predictor_pixels = n
+        if predictor_idx is not None:
+            self._set_predictor_idx(predictor_idx, load)
+            return
         sidelength_x = self.cutout_data.cutout_sidelength_x
         sidelength_y = self.cutout_data.cutout_sidelength_y
         
@@ -184,32 +184,59 @@ class CPM(object):
                 np.linalg.norm(valid_normalized_fluxes.T, axis=1)
                 * np.linalg.norm(self.normalized_target_fluxes)
             )
-            chosen_idx = valid_idx[np.argsort(cos_sim)[::-1][0:n]]
+            # A stable sort breaks ties by pixel index, which ``CutoutData.get_predictor_idx`` relies on.
+            chosen_idx = valid_idx[np.argsort(cos_sim, kind="stable")[::-1][0:n]]
 
         if method == "random":
             chosen_idx = np.random.choice(valid_idx, size=n, replace=False)
 
         if method == "similar_brightness":
-            valid_flux_medians = self.cutout_data.flattened_flux_medians[
-                ~self.mask_excluded_pixels.ravel()
-            ]
-            diff = np.abs(valid_flux_medians - self.target_median)
-            chosen_idx = valid_idx[np.argsort(diff)[0:n]]
+            # Uses a brightness-sorted index of the cutout instead of sorting every pixel for each target.
+            chosen_idx = self.cutout_data._similar_brightness_idx(
+                self.target_row, self.target_col, n, self.exclusion_size, self.method_exclusion
+            )
+
+        self._set_predictor_idx(chosen_idx, load)
 
+    def _set_predictor_idx(self, chosen_idx, load=True):
+        """Set the predictor pixels given their (flattened) indices in the cutout.
+        """
+        sidelength_y = self.cutout_data.cutout_sidelength_y
         self.locations_predictor_pixels = np.array(
             [[idx // sidelength_y, idx % sidelength_y] for idx in chosen_idx]
         )
         loc = self.locations_predictor_pixels.T
-        mask = np.full(self.cutout_data.fluxes[0].shape, False)
+        mask = np.full(self.cutout_data.flux_medians.shape, False)
         mask[loc[0], loc[1]] = True  # pylint: disable=unsubscriptable-object
-        self.predictor_pixels_fluxes = self.cutout_data.fluxes[:, loc[0], loc[1]]  # pylint: disable=unsubscriptable-object
-        self.normalized_predictor_pixels_fluxes = self.cutout_data.normalized_fluxes[
-            :, loc[0], loc[1]  # pylint: disable=unsubscriptable-object
-        ]
         self.mask_predictor_pixels = mask
         self.are_predictors_set = True
+        if not load:
+            return
+        self.normalized_predictor_pixels_fluxes = self.cutout_data.get_pixel_data(
+            "normalized_fluxes", loc[0], loc[1]  # pylint: disable=unsubscriptable-object
+        )
         self.m = self.normalized_predictor_pixels_fluxes
 
+    @property
+    def predictor_pixels_fluxes(self):
+        """The (not normalized) light curves of the predictor pixels. These are not used to fit, so they are only read when accessed.
+        """
+        if not self.are_predictors_set:
+            return None
+        loc = self.locations_predictor_pixels.T
+        return self.cutout_data.get_pixel_data("fluxes", loc[0], loc[1])  # pylint: disable=unsubscriptable-object
+
+    def get_m(self, cadences=slice(None)):
+        """Get rows of the design matrix (the normalized predictor pixel light curves).
+
+        Args:
+            cadences (Optional[slice]): The cadences to get. Default is every cadence.
+        """
+        if self.m is not None:
+            return self.m[cadences]
+        loc = self.locations_predictor_pixels.T
+        return self.cutout_data.get_pixel_data("normalized_fluxes", loc[0], loc[1], cadences)  # pylint: disable=unsubscriptable-object
+
     def set_target_exclusion_predictors(
         self,
         target_row,
@@ -219,22 +246,30 @@ class CPM(object):
         n=256,
         predictor_method="cosine_similarity",
         seed=None,
+        predictor_idx=None,
+        load=True,
     ):
         """Convenience function that simply calls the set_target(), set_exclusion(), set_predictor_pixels() functions sequentially
         """
         self.set_target(target_row, target_col)
         self.set_exclusion(exclusion_size, method=exclusion_method)
-        self.set_predictor_pixels(n, method=predictor_method, seed=seed)
+        self.set_predictor_pixels(n, method=predictor_method, seed=seed, predictor_idx=predictor_idx, load=load)
 
     def set_L2_reg(self, reg):
-        """Set the L2-regularization for the CPM model and generates the regularization matrix.
+        """Set the L2-regularization for the CPM model and generates the (diagonal) regularization vector.
 
         Args:
             reg (float): The L2-regularization value.
 
         """
         self.reg = reg
-        self.reg_matrix = reg * np.identity(self.num_predictor_pixels)
+        self.reg_vector = np.full(self.num_predictor_pixels, reg, dtype=float)
+
+    @property
+    def reg_matrix(self):
+        """The (diagonal) regularization matrix, built from ``reg_vector``.
+        """
+        return None if self.reg_vector is None else np.diag(self.reg_vector)
 
     def predict(self, m=None, params=None, mask=None):
         """Make a prediction for the CPM model.
@@ -260,6 +295,7 @@ class CPM(object):
         return prediction
 
     def plot_model(self, size_predictors=10):
+        import matplotlib.pyplot as plt
 
         fig, ax = plt.subplots()
         self._plot_model_onto_axes(ax, size_predictors=size_predictors)
@@ -1,5 +1,5 @@
+import hashlib
 import numpy as np
-import matplotlib.pyplot as plt
 
 from .cutout_data import CutoutData
 
@@ -20,7 +20,7 @@ class CustomModel(object):
         self.num_terms = None
         self.m = None
         self.reg = None
-        self.reg_matrix = None
+        self.reg_vector = None
         self.params = None
         self.prediction = None
 
@@ -32,9 +32,22 @@ class CustomModel(object):
                 print("The custom model lightcurve must be the same length as the dataset.")
                 return
             else:
-                self.m = flux.reshape((-1, 1))
+                # Models with the same light curve (e.g., every pixel of a ``Source``) share the block.
+                key = ("custom", hashlib.sha1(np.ascontiguousarray(flux).tobytes()).hexdigest(), flux.dtype.str)
+                self.m = self.cutout_data.get_design_block(key, lambda: self._build_m(flux))
                 self.num_terms = self.m.shape[1]
 
+    def _build_m(self, flux):
+        m = np.array(flux).reshape((-1, 1))
+        if self.cutout_data.dtype is not None:
+            m = m.astype(self.cutout_data.dtype)
+        return m
+
+    def get_m(self, cadences=slice(None)):
+        """Get rows of the custom model design matrix.
+        """
+        return self.m[cadences]
+
     def set_L2_reg(self, reg):
         """Set the L2-regularization for the custom model.
 
@@ -43,7 +56,13 @@ class CustomModel(object):
 
         """
         self.reg = reg
-        self.reg_matrix = reg * np.identity(self.num_terms)
+        self.reg_vector = np.full(self.num_terms, reg, dtype=float)
+
+    @property
+    def reg_matrix(self):
+        """The (diagonal) regularization matrix, built from ``reg_vector``.
+        """
+        return None if self.reg_vector is None else np.diag(self.reg_vector)
 
     def predict(self, m=None, params=None, mask=None):
         """Make a prediction for the custom model.
@@ -0,0 +1,295 @@
+import os
+import glob
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import contextlib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the index is not locked.
+    fcntl = None
+
+
+class TesscutFetcher(object):
+    """Fetch cutouts from MAST using ``astroquery.mast.Tesscut``.
+
+    This is the default fetcher of ``CutoutCache``. Any object with the same ``sectors`` and ``fetch``
+    methods can be used instead (see ``DirectoryFetcher``).
+    """
+
+    def sectors(self, ra, dec):
+        """Get the sectors in which the coordinates (in degrees) were observed.
+        """
+        from astropy.coordinates import SkyCoord
+        from astroquery.mast import Tesscut
+
+        sector_table = Tesscut.get_sectors(coordinates=SkyCoord(ra, dec, unit="deg"))
+        return [int(sector) for sector in sector_table["sector"]]
+
+    def fetch(self, ra, dec, size, sector, directory):
+        """Download the cutout for a single sector into ``directory`` and return its path.
+        """
+        from astropy.coordinates import SkyCoord
+        from astroquery.mast import Tesscut
+
+        manifest = Tesscut.download_cutouts(
+            coordinates=SkyCoord(ra, dec, unit="deg"), size=size, sector=sector, path=directory
+        )
+        return manifest["Local Path"][0]
+
+
+class DirectoryFetcher(object):
+    """Fetch cutouts from a local directory of TessCut files instead of MAST.
+
+    This can stand in for ``TesscutFetcher`` in tests or when the cutouts have been mirrored locally.
+    The files must keep the TessCut naming scheme (e.g., ``tess-s0010-1-1_10.000000_20.000000_64x64_astrocut.fits``).
+
+    Args:
+        directory (str): The directory containing the cutouts.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _paths(self, ra, dec, size, sector="*"):
+        sector = sector if sector == "*" else f"{int(sector):04d}"
+        pattern = f"tess-s{sector}-*_{ra:.6f}_{dec:.6f}_{size}x{size}_astrocut.fits"
+        return sorted(glob.glob(os.path.join(self.directory, pattern)))
+
+    def sectors(self, ra, dec):
+        pattern = os.path.join(self.directory, f"tess-s*_{ra:.6f}_{dec:.6f}_*_astrocut.fits")
+        return sorted({_sector_from_file_name(path) for path in glob.glob(pattern)})
+
+    def fetch(self, ra, dec, size, sector, directory):
+        paths = self._paths(ra, dec, size, sector)
+        if len(paths) == 0:
+            raise FileNotFoundError(f"No cutout for ({ra}, {dec}), size {size}, sector {sector} in {self.directory}")
+        return shutil.copy(paths[0], directory)
+
+
+class CutoutCache(object):
+    """A local on-disk cache of TESS cutouts keyed by coordinates, cutout size, and sector.
+
+    Each cutout is stored in a directory named after the hash of its key. An index of the entries
+    (with their size and last access time) is kept so that the least recently used entries are evicted
+    once the cache grows beyond ``max_bytes``. The index is only read and updated while holding a lock on 
+    the cache directory, so several processes can use the same cache at once. Cutouts are fetched without 
+    holding the lock, and entry directories that are missing from the index are added back when it is read.
+
+    Args:
+        directory (Optional[str]): The cache directory. Default is ``~/.tess_cpm/cutouts``.
+        max_bytes (Optional[int]): The maximum total size of the cached files. Default is no limit.
+        compress (Optional[bool]): If ``True``, store the cutouts gzip-compressed with single precision (float32) flux cubes.
+            Compressed files cannot be opened with ``memmap=True``.
+        offline (Optional[bool]): If ``True``, never contact the fetcher and only use the cached cutouts.
+        fetcher (Optional): The object used to get cutouts that are not cached. Default is ``TesscutFetcher()``.
+    """
+
+    index_name = "index.json"
+
+    def __init__(self, directory=None, max_bytes=None, compress=False, offline=False, fetcher=None):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".tess_cpm", "cutouts")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.offline = offline
+        self.fetcher = TesscutFetcher() if fetcher is None else fetcher
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(ra, dec, size, sector):
+        """Get the cache key of a cutout. Coordinates are in degrees and are rounded to the precision used by TessCut.
+        """
+        return hashlib.sha256(f"{ra:.6f},{dec:.6f},{size},{int(sector)}".encode()).hexdigest()[:32]
+
+    def get(self, ra, dec, size=64, sector=None):
+        """Get the paths to the cached cutouts, fetching the ones that are not cached yet.
+
+        Args:
+            ra (float): Right ascension in degrees.
+            dec (float): Declination in degrees.
+            size (Optional[int]): The cutout sidelength in pixels.
+            sector (Optional[int]): The sector. If ``None``, every sector the coordinates were observed in
+                (or, in offline mode, every cached sector).
+
+        Returns:
+            A list of paths, sorted by sector.
+        """
+        if sector is not None:
+            sectors = [int(sector)]
+        elif self.offline:
+            sectors = None
+        else:
+            sectors = self.fetcher.sectors(ra, dec)
+
+        stored = {}
+        while True:
+            with self._locked():
+                index = self._load_index()
+                # The cutouts fetched in the previous pass, re-read since another process may have changed the index.
+                index.update(stored)
+                if sectors is None:
+                    sectors = sorted(
+                        entry["sector"] for entry in index.values()
+                        if entry["query"] == [round(ra, 6), round(dec, 6), size]
+                    )
+                keys = [self.key(ra, dec, size, sector) for sector in sectors]
+                missing = [
+                    sector for sector, key in zip(sectors, keys) 
+                    if key not in index or not os.path.exists(os.path.join(self.directory, index[key]["file"]))
+                ]
+                if not missing:
+                    for key in keys:
+                        index[key]["last_access"] = time.time()
+                    self._evict(index, keep=keys)
+                    self._save_index(index)
+                    return [os.path.join(self.directory, index[key]["file"]) for key in keys]
+            if self.offline:
+                raise FileNotFoundError(
+                    f"Cutout for ({ra}, {dec}), size {size}, sector {missing[0]} is not cached and the cache is offline."
+                )
+            for sector in missing:
+                key = self.key(ra, dec, size, sector)
+                stored[key] = self._store(key, ra, dec, size, sector)
+
+    def _store(self, key, ra, dec, size, sector):
+        entry_directory = os.path.join(self.directory, key)
+        os.makedirs(entry_directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.directory) as download_directory:
+            path = self.fetcher.fetch(ra, dec, size, sector, download_directory)
+            file_name = os.path.basename(path)
+            if self.compress:
+                file_name += ".gz"
+                _write_float32(path, os.path.join(download_directory, file_name))
+                path = os.path.join(download_directory, file_name)
+            destination = os.path.join(entry_directory, file_name)
+            # Renamed into place, so other processes never see a partial file.
+            os.replace(path, destination)
+        return {
+            "query": [round(ra, 6), round(dec, 6), size],
+            "sector": int(sector),
+            "file": os.path.relpath(destination, self.directory),
+            "bytes": os.path.getsize(destination),
+            "last_access": time.time(),
+        }
+
+    def _evict(self, index, keep=()):
+        if self.max_bytes is None:
+            return
+        total = sum(entry["bytes"] for entry in index.values())
+        for key in sorted(index, key=lambda key: index[key]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            total -= index[key]["bytes"]
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            del index[key]
+
+    def clear(self):
+        """Remove every cached cutout.
+        """
+        with self._locked():
+            for key in self._load_index():
+                shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            self._save_index({})
+
+    @property
+    def size(self):
+        """The total size of the cached files in bytes.
+        """
+        with self._locked():
+            return sum(entry["bytes"] for entry in self._load_index().values())
+
+    def _locked(self):
+        return _index_lock(self.directory)
+
+    def _load_index(self):
+        path = os.path.join(self.directory, self.index_name)
+        index = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+        # Add back the entries whose index update was lost (e.g., written by a process without the lock).
+        for key in os.listdir(self.directory):
+            if key not in index and len(key) == 32:
+                entry = _entry_from_directory(self.directory, key)
+                if entry is not None:
+                    index[key] = entry
+        return index
+
+    def _save_index(self, index):
+        # Written to a temporary file first so that other processes never read a partial index.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.directory, self.index_name))
+
+
+@contextlib.contextmanager
+def _index_lock(directory):
+    """Hold an exclusive lock on a cache directory's ``index.lock`` file, e.g., for a read-modify-write of its index.
+    """
+    with open(os.path.join(directory, "index.lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _entry_from_directory(directory, key):
+    # Rebuild the index entry of a cutout from its (TessCut-named) file, or ``None`` if it is not a complete entry.
+    entry_directory = os.path.join(directory, key)
+    if not os.path.isdir(entry_directory):
+        return None
+    for file_name in os.listdir(entry_directory):
+        try:
+            _, ra, dec, size, _ = file_name.split("_")
+            ra, dec, size = float(ra), float(dec), int(size.split("x")[0])
+            sector = _sector_from_file_name(file_name)
+        except ValueError:
+            continue
+        if CutoutCache.key(ra, dec, size, sector) != key:
+            continue
+        path = os.path.join(entry_directory, file_name)
+        return {
+            "query": [round(ra, 6), round(dec, 6), size],
+            "sector": sector,
+            "file": os.path.relpath(path, directory),
+            "bytes": os.path.getsize(path),
+            "last_access": os.path.getmtime(path),
+        }
+    return None
+
+
+def _sector_from_file_name(path):
+    return int(os.path.basename(path).split("-")[1].strip("s"))
+
+
+def _write_float32(path, destination):
+    # Store the flux cubes in single precision and let astropy gzip the file (based on the ``.gz`` extension).
+    from astropy.io import fits
+
+    with fits.open(path) as hdul:
+        for i, hdu in enumerate(list(hdul)):
+            if isinstance(hdu, fits.BinTableHDU):
+                columns = []
+                for column in hdu.columns:
+                    data = hdu.data[column.name]
+                    if column.format.endswith("D") and column.name != "TIME":
+                        column = fits.Column(name=column.name, format=column.format[:-1] + "E", dim=column.dim,
+                                             unit=column.unit, array=data.astype(np.float32))
+                    columns.append(column)
+                hdul[i] = fits.BinTableHDU.from_columns(columns, header=hdu.header)
+            elif isinstance(hdu, fits.ImageHDU) and hdu.data is not None and hdu.data.dtype.kind == "f":
+                hdu.data = hdu.data.astype(np.float32)
+        hdul.writeto(destination, overwrite=True)
@@ -1,9 +1,11 @@
+import os
+import shutil
+import tempfile
 import numpy as np
-import matplotlib.pyplot as plt
-from astroquery.mast import Tesscut
-from astropy.io import fits
-from astropy.wcs import WCS
-import lightkurve as lk
+
+from .cutout_cache import CutoutCache
+from .background import FaintestPixelsBackground
+from . import instrumentation
 
 
 class CutoutData(object):
@@ -14,98 +16,536 @@ class CutoutData(object):
         remove_bad (bool): If ``True``, remove the data points that have been flagged by the TESS team. Default is ``True``.
         verbose (bool): If ``True``, print statements containing information. Default is ``True``.
         provenance (str): If ``TessCut``, the image being passed through is a TessCut cutout. If ``eleanor``, it is an eleanor postcard.
+        memmap (bool): If ``True``, keep the ``FLUX`` and ``FLUX_ERR`` cubes memory-mapped and apply the quality 
+            filtering as an index. The (normalized) flux cubes are then only read when first accessed, 
+            and ``get_pixel_data`` reads just the requested pixels. Default is ``False``.
+        dtype (Optional): The floating point precision (e.g., ``np.float32``) used for the flux cubes and every 
+            model built from this object. The default (``None``) keeps the precision stored in the file.
+        bkg_subtract (Optional): If ``True``, subtract the median light curve of the ``bkg_n`` faintest pixels 
+            (``FaintestPixelsBackground``) from every pixel. Any object with an ``estimate(cutout_data)`` method 
+            returning the background of each cadence can be passed instead (e.g., ``PercentileBackground``). 
+            The estimate is computed a chunk of cadences at a time. Default is ``False``.
+        bkg_n (Optional[int]): The number of faint pixels used if ``bkg_subtract`` is ``True``.
 
     """
 
+    # The approximate size in bytes of the chunks that the cube is processed in for the background 
+    # subtraction and the median images, so that no intermediate array the size of the full cube is created.
+    chunk_bytes = 2 ** 26
+
+    # In ``memmap`` mode these cubes are not set in ``__init__`` and are instead read on first access.
+    _lazy_attributes = (
+        "fluxes", "flux_errors", "normalized_fluxes", "flattened_normalized_fluxes", "normalized_flux_errors"
+    )
+
     def __init__(self, path, remove_bad=True, verbose=True, 
-                 provenance='TessCut', quality=None, bkg_subtract=False, bkg_n=100):
+                 provenance='TessCut', quality=None, bkg_subtract=False, bkg_n=100, memmap=False, dtype=None):
+        from astropy.io import fits
+        from astropy.wcs import WCS
+
         self.file_path = path
+        self.dtype = None if dtype is None else np.dtype(dtype)
         self.file_name = path.split("/")[-1]
+        # The options that change the loaded data (used, e.g., in the keys of ``ResultCache``).
+        self.load_options = {
+            "remove_bad": remove_bad, "provenance": provenance, "quality": quality, "bkg_subtract": bkg_subtract, 
+            "bkg_n": bkg_n, "dtype": self.dtype,
+        }
         
-        if provenance == 'TessCut':
-            s = self.file_name.split("-")
-            self.sector = s[1].strip("s").lstrip("0")
-            self.camera = s[2]
-            self.ccd = s[3][0]
-
-            with fits.open(path, mode="readonly") as hdu:
-                self.time = hdu[1].data["TIME"]  # pylint: disable=no-member
-                self.fluxes = hdu[1].data["FLUX"]  # pylint: disable=no-member
-                self.flux_errors = hdu[1].data["FLUX_ERR"]  # pylint: disable=no-member
-                if quality is None:
-                    self.quality = hdu[1].data["QUALITY"]  # pylint: disable=no-member
-                else:
-                    self.quality = quality
-                try:
-                    self.wcs_info = WCS(hdu[2].header)  # pylint: disable=no-member
-                except Exception as inst:
-                    print(inst)
-                    print("WCS Info could not be retrieved")
+        with instrumentation.stage("load", file_name=self.file_name):
+            if provenance == 'TessCut':
+                s = self.file_name.split("-")
+                self.sector = s[1].strip("s").lstrip("0")
+                self.camera = s[2]
+                self.ccd = s[3][0]
+
+                with fits.open(path, mode="readonly", memmap=(True if memmap else None)) as hdu:
+                    self.time = hdu[1].data["TIME"]  # pylint: disable=no-member
+                    self.fluxes = hdu[1].data["FLUX"]  # pylint: disable=no-member
+                    self.flux_errors = hdu[1].data["FLUX_ERR"]  # pylint: disable=no-member
+                    if quality is None:
+                        self.quality = hdu[1].data["QUALITY"]  # pylint: disable=no-member
+                    else:
+                        self.quality = quality
+                    try:
+                        self.wcs_info = WCS(hdu[2].header)  # pylint: disable=no-member
+                    except Exception as inst:
+                        print(inst)
+                        print("WCS Info could not be retrieved")
         
-        elif provenance == 'eleanor':
-            with fits.open(path, mode="readonly") as hdu:
-                self.sector = int(hdu[2].header["SECTOR"])  # pylint: disable=no-member
-                self.camera = int(hdu[2].header["CAMERA"])  # pylint: disable=no-member
-                self.ccd    = int(hdu[2].header["CCD"])  # pylint: disable=no-member
-
-                self.time = (hdu[1].data['TSTART'] + hdu[1].data['TSTOP'])/2  # pylint: disable=no-member
-                self.fluxes = hdu[2].data  # pylint: disable=no-member
-                self.flux_errors = hdu[3].data  # pylint: disable=no-member
-                if quality is None:
-                    self.quality = hdu[1].data['QUALITY']  # pylint: disable=no-member
-                else:
-                    self.quality = quality
+            elif provenance == 'eleanor':
+                with fits.open(path, mode="readonly", memmap=(True if memmap else None)) as hdu:
+                    self.sector = int(hdu[2].header["SECTOR"])  # pylint: disable=no-member
+                    self.camera = int(hdu[2].header["CAMERA"])  # pylint: disable=no-member
+                    self.ccd    = int(hdu[2].header["CCD"])  # pylint: disable=no-member
 
-                try:
-                    self.wcs_info = WCS(hdu[2].header)  # pylint: disable=no-member
-                except Exception as inst:
-                    print(inst)
-                    print("WCS Info could not be retrieved")
+                    self.time = (hdu[1].data['TSTART'] + hdu[1].data['TSTOP'])/2  # pylint: disable=no-member
+                    self.fluxes = hdu[2].data  # pylint: disable=no-member
+                    self.flux_errors = hdu[3].data  # pylint: disable=no-member
+                    if quality is None:
+                        self.quality = hdu[1].data['QUALITY']  # pylint: disable=no-member
+                    else:
+                        self.quality = quality
+
+                    try:
+                        self.wcs_info = WCS(hdu[2].header)  # pylint: disable=no-member
+                    except Exception as inst:
+                        print(inst)
+                        print("WCS Info could not be retrieved")
                     
-        else:
-            raise ValueError('Data provenance not understood. Pass through TessCut or eleanor')
-
-        self.flagged_times = self.time[self.quality > 0]
-        # If remove_bad is set to True, we'll remove the values with a nonzero entry in the quality array
-        if remove_bad == True:
-            bool_good = self.quality == 0
-            if verbose == True:
-                print(
-                    f"Removing {np.sum(~bool_good)} bad data points "
-                    f"(out of {np.size(bool_good)}) using the TESS provided QUALITY array"
-                )
-            self.time = self.time[bool_good]
-            self.fluxes = self.fluxes[bool_good]
-            self.flux_errors = self.flux_errors[bool_good]
-
-        # basic background correction based on subtracting median flux light curve of 500 faintest pixels
-        if bkg_subtract:
-            print("Performing initial basic background subtraction.")
-            self.flux_medians = np.nanmedian(self.fluxes, axis=0)
-            self.faint_pixel_locations = np.unravel_index(np.argpartition(self.flux_medians.ravel(),bkg_n)[:bkg_n], 
-                                                     self.flux_medians.shape)
-            self.faint_pixel_lcs = self.fluxes[:, self.faint_pixel_locations[0], self.faint_pixel_locations[1]]
-            self.bkg_estimate = np.nanmedian(self.faint_pixel_lcs, axis=1)
-            assert self.time.shape == self.bkg_estimate.shape
-            self.fluxes -= self.bkg_estimate.reshape(-1, 1, 1)
-
-        # We're going to precompute the pixel lightcurve medians since it's used to set the predictor pixels
-        # but never has to be recomputed. np.nanmedian is used to handle images containing NaN values.
-        self.flux_medians = np.nanmedian(self.fluxes, axis=0)
-        self.cutout_sidelength_x = self.fluxes[0].shape[0]
-        self.cutout_sidelength_y = self.fluxes[0].shape[1]
+            else:
+                raise ValueError('Data provenance not understood. Pass through TessCut or eleanor')
+
+        with instrumentation.stage("normalize", file_name=self.file_name):
+            self.flagged_times = self.time[self.quality > 0]
+            self._memmap_cubes = None
+            self._cadence_idx = None
+            # If remove_bad is set to True, we'll remove the values with a nonzero entry in the quality array
+            if remove_bad == True:
+                bool_good = self.quality == 0
+                if verbose == True:
+                    print(
+                        f"Removing {np.sum(~bool_good)} bad data points "
+                        f"(out of {np.size(bool_good)}) using the TESS provided QUALITY array"
+                    )
+                self.time = self.time[bool_good]
+                if memmap:
+                    self._cadence_idx = np.flatnonzero(bool_good)
+                else:
+                    self.fluxes = self.fluxes[bool_good]
+                    self.flux_errors = self.flux_errors[bool_good]
+
+            if self.dtype is not None and not memmap:
+                self.fluxes = self.fluxes.astype(self.dtype)
+                self.flux_errors = self.flux_errors.astype(self.dtype)
+
+            if memmap:
+                self._memmap_cubes = {"fluxes": self.__dict__.pop("fluxes"), "flux_errors": self.__dict__.pop("flux_errors")}
+
+            cube = self._memmap_cubes["fluxes"] if memmap else self.fluxes
+            self.cutout_sidelength_x = cube.shape[1]
+            self.cutout_sidelength_y = cube.shape[2]
+
+            # basic background correction based on subtracting median flux light curve of the faintest pixels
+            if bkg_subtract is not False and bkg_subtract is not None:
+                if verbose:
+                    print("Performing initial basic background subtraction.")
+                self.bkg_estimator = FaintestPixelsBackground(bkg_n) if bkg_subtract is True else bkg_subtract
+                with instrumentation.stage("background", file_name=self.file_name):
+                    bkg_estimate = self.bkg_estimator.estimate(self)
+                    assert self.time.shape == bkg_estimate.shape
+                    if not memmap:
+                        # In place, so no temporary copy of the cube is made.
+                        self.fluxes -= bkg_estimate.reshape(-1, 1, 1)
+                    # In ``memmap`` mode, this is subtracted whenever the flux cube is read.
+                    self.bkg_estimate = bkg_estimate
+                if isinstance(self.bkg_estimator, FaintestPixelsBackground):
+                    self.faint_pixel_locations = self.bkg_estimator.pixel_locations
+
+            # We're going to precompute the pixel lightcurve medians since it's used to set the predictor pixels
+            # but never has to be recomputed. np.nanmedian is used to handle images containing NaN values.
+            self.flux_medians = self._flux_medians()
         
-        self.flattened_flux_medians = self.flux_medians.reshape(
-            self.cutout_sidelength_x * self.cutout_sidelength_y
-        )
-        # We rescale the fluxes by dividing by the median and then centering them around zero.
-        self.normalized_fluxes = (self.fluxes / self.flux_medians) - 1
-        self.flattened_normalized_fluxes = self.normalized_fluxes.reshape(
-            self.time.shape[0], 
-            self.cutout_sidelength_x * self.cutout_sidelength_y
+            self.flattened_flux_medians = self.flux_medians.reshape(
+                self.cutout_sidelength_x * self.cutout_sidelength_y
+            )
+            if not memmap:
+                # We rescale the fluxes by dividing by the median and then centering them around zero.
+                self.normalized_fluxes = (self.fluxes / self.flux_medians) - 1
+                self.flattened_normalized_fluxes = self.normalized_fluxes.reshape(
+                    self.time.shape[0], 
+                    self.cutout_sidelength_x * self.cutout_sidelength_y
+                )
+
+                self.normalized_flux_errors = self.flux_errors / self.flux_medians
+
+    @classmethod
+    def from_cache(cls, ra, dec, sector, size=64, cache=None, **kwargs):
+        """Create a CutoutData object from a cutout in a ``CutoutCache`` (fetching it first if needed).
+
+        Args:
+            ra (float): Right ascension in degrees.
+            dec (float): Declination in degrees.
+            sector (int): The sector.
+            size (Optional[int]): The cutout sidelength in pixels.
+            cache (Optional[CutoutCache]): The cache to use. Default is ``CutoutCache()``.
+            **kwargs: Passed to ``CutoutData``.
+        """
+        if cache is None:
+            cache = CutoutCache()
+        return cls(cache.get(ra, dec, size=size, sector=sector)[0], **kwargs)
+
+    def __getattr__(self, name):
+        # Only called if ``name`` has not been set, i.e., for the cubes that have not been read yet in ``memmap`` mode.
+        if name not in self._lazy_attributes or self.__dict__.get("_memmap_cubes") is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        value = self._read_lazy_attribute(name)
+        setattr(self, name, value)
+        return value
+
+    def _read_lazy_attribute(self, name):
+        # Read one of the ``_lazy_attributes`` in ``memmap`` mode without keeping it on the object.
+        if name in ("fluxes", "flux_errors"):
+            return self._read_cube(name)
+        if name == "normalized_fluxes":
+            return (self._read_cube("fluxes") / self.flux_medians) - 1
+        if name == "flattened_normalized_fluxes":
+            return self.normalized_fluxes.reshape(
+                self.time.shape[0], self.cutout_sidelength_x * self.cutout_sidelength_y
+            )
+        if name == "normalized_flux_errors":
+            return self._read_cube("flux_errors") / self.flux_medians
+
+    def _read_cube(self, name, key=(slice(None), slice(None)), cadences=slice(None)):
+        """Read (part of) a memory-mapped cube, keeping only the good cadences and applying the background subtraction.
+        """
+        if self._cadence_idx is not None:
+            if cadences == slice(None):
+                data = self._memmap_cubes[name][(slice(None),) + tuple(key)][self._cadence_idx]
+            else:
+                # Only the requested cadences are read from the file.
+                data = self._memmap_cubes[name][self._cadence_idx[cadences]][(slice(None),) + tuple(key)]
+            if self.dtype is not None:
+                data = data.astype(self.dtype, copy=False)
+        else:
+            data = np.array(self._memmap_cubes[name][(cadences,) + tuple(key)], dtype=self.dtype)
+        bkg_estimate = self.__dict__.get("bkg_estimate")
+        if name == "fluxes" and bkg_estimate is not None:
+            data -= bkg_estimate[cadences].reshape((-1,) + (1,) * (data.ndim - 1))
+        return data
+
+    def _chunk_size(self, frame_size):
+        # The number of frames (or image rows) of ``frame_size`` values that fit in ``chunk_bytes``.
+        itemsize = (self.dtype or np.dtype(np.float64)).itemsize
+        return max(1, self.chunk_bytes // (frame_size * itemsize))
+
+    def _flux_medians(self):
+        # Computed a few image rows at a time, since ``np.nanmedian`` copies its input 
+        # and in ``memmap`` mode the full cube is never held in memory.
+        if self._memmap_cubes is None:
+            read = lambda rows: self.fluxes[:, rows]
+        else:
+            read = lambda rows: self._read_cube("fluxes", (rows, slice(None)))
+        chunk_rows = self._chunk_size(self.time.size * self.cutout_sidelength_y)
+        return np.concatenate([
+            np.nanmedian(read(slice(start, start + chunk_rows)), axis=0)
+            for start in range(0, self.cutout_sidelength_x, chunk_rows)
+        ])
+
+    def _iter_raw_flux_frames(self, chunk_size=None):
+        """Iterate over the flux cube (without the background subtraction) in chunks of cadences.
+
+        Yields:
+            The ``start`` and ``stop`` index of the chunk and its frames (stop - start, rows, cols).
+        """
+        if chunk_size is None:
+            chunk_size = self._chunk_size(self.cutout_sidelength_x * self.cutout_sidelength_y)
+        for start in range(0, self.time.size, chunk_size):
+            stop = min(start + chunk_size, self.time.size)
+            if self._memmap_cubes is None:
+                frames = self.fluxes[start:stop]
+            elif self._cadence_idx is None:
+                frames = self._memmap_cubes["fluxes"][start:stop]
+            else:
+                frames = self._memmap_cubes["fluxes"][self._cadence_idx[start:stop]]
+            yield start, stop, np.asarray(frames, dtype=self.dtype)
+
+    def get_design_block(self, key, build):
+        """Get a block of design matrix columns that is shared by every model built from this object.
+
+        The block is built (with ``build()``) the first time a ``key`` is requested and the same read-only 
+        array is returned afterwards, e.g., so that the polynomial model of every pixel in an aperture 
+        uses a single (time, terms) array.
+
+        Args:
+            key (tuple): Identifies the block, e.g., ``("poly", scale, num_terms)``.
+            build (callable): Returns the block.
+        """
+        blocks = self.__dict__.setdefault("_design_blocks", {})
+        if key not in blocks:
+            block = build()
+            block.flags.writeable = False
+            blocks[key] = block
+        return blocks[key]
+
+    def get_pixel_data(self, name, rows, cols, cadences=slice(None)):
+        """Get the light curves of a set of pixels.
+
+        This is equivalent to ``getattr(self, name)[cadences][:, rows, cols]``, but in ``memmap`` mode only the 
+        requested pixels (and cadences) are read if the full cube has not been accessed yet.
+
+        Args:
+            name (str): One of "fluxes", "flux_errors", "normalized_fluxes", or "normalized_flux_errors".
+            rows (int or array): The row(s) of the pixels.
+            cols (int or array): The column(s) of the pixels.
+            cadences (Optional[slice]): The (good) cadences to get. Default is every cadence.
+        """
+        if name in self.__dict__ or self._memmap_cubes is None:
+            return getattr(self, name)[cadences][:, rows, cols]
+        if name in ("fluxes", "flux_errors"):
+            return self._read_cube(name, (rows, cols), cadences)
+        if name == "normalized_fluxes":
+            return (self._read_cube("fluxes", (rows, cols), cadences) / self.flux_medians[rows, cols]) - 1
+        if name == "normalized_flux_errors":
+            return self._read_cube("flux_errors", (rows, cols), cadences) / self.flux_medians[rows, cols]
+        raise ValueError(f"Unknown pixel data: {name}")
+
+    def get_predictor_idx(self, rows, cols, n=256, method="similar_brightness", exclusion_size=5, 
+                          exclusion_method="closest", seed=None, block_size=256):
+        """Choose the predictor pixels for many target pixels at once.
+
+        This gives the same predictor pixels as calling ``CPM.set_predictor_pixels`` for each target pixel 
+        (up to floating point rounding of the cosine similarities), but the exclusion regions are applied as 
+        one boolean mask per block of targets and, for the "cosine_similarity" method, the similarities of 
+        a whole block are computed with a single matrix product using light curve norms that are only 
+        computed once per cutout.
+
+        Args:
+            rows (array): The rows of the target pixels.
+            cols (array): The columns of the target pixels.
+            n (Optional[int]): Number of predictor pixels to use for each target pixel.
+            method (Optional): The method for choosing predictor pixels (see ``CPM.set_predictor_pixels``).
+            exclusion_size (Optional[int]): The size of the exclusion region (see ``CPM.set_exclusion``).
+            exclusion_method (Optional): The method for excluding a region (see ``CPM.set_exclusion``).
+            seed (Optional[int]): The seed passed to ``np.random.seed`` before choosing each target pixel's 
+                predictors with the "random" method (as ``Source.add_cpm_model`` does for every pixel).
+            block_size (Optional[int]): The number of target pixels to process at a time.
+
+        Returns:
+            The (flattened) indices of the predictor pixels with shape (number of targets, ``n``).
+        """
+        rows, cols = np.atleast_1d(rows), np.atleast_1d(cols)
+        predictor_idx = np.empty((rows.size, n), dtype=int)
+        if method == "similar_brightness":
+            for i, (row, col) in enumerate(zip(rows, cols)):
+                predictor_idx[i] = self._similar_brightness_idx(row, col, n, exclusion_size, exclusion_method)
+            return predictor_idx
+
+        pixel_rows, pixel_cols = np.divmod(np.arange(self.flux_medians.size), self.cutout_sidelength_y)
+        for start in range(0, rows.size, block_size):
+            block = slice(start, start + block_size)
+            excluded = _exclusion_mask(
+                pixel_rows, pixel_cols, rows[block, None], cols[block, None], exclusion_size, exclusion_method
+            )
+            target_idx = rows[block] * self.cutout_sidelength_y + cols[block]
+            if method == "cosine_similarity":
+                norms = self._get_flattened_normalized_flux_norms()
+                cos_sim = np.dot(
+                    self.flattened_normalized_fluxes[:, target_idx].T, self.flattened_normalized_fluxes
+                ) / (norms[target_idx, None] * norms)
+                cos_sim[excluded] = -np.inf
+                predictor_idx[block] = np.argsort(cos_sim, axis=1, kind="stable")[:, ::-1][:, 0:n]
+            elif method == "random":
+                for i, exclude in enumerate(excluded):
+                    if seed != None:
+                        np.random.seed(seed=seed)
+                    predictor_idx[start + i] = np.random.choice(np.flatnonzero(~exclude), size=n, replace=False)
+            else:
+                raise ValueError(f"Unknown predictor pixel method: {method}")
+        return predictor_idx
+
+    def get_shared_predictor_idx(self, rows, cols, n=256, method="similar_brightness", exclusion_size=5,
+                                 exclusion_method="closest", seed=None):
+        """Choose one set of predictor pixels for a group of target pixels (e.g., an aperture).
+
+        The excluded region is the union of the target pixels' exclusion regions, so none of the predictors
+        is close to any of the targets. The "similar_brightness" method compares each pixel's median flux with
+        the median of the targets' median fluxes, and the "cosine_similarity" method compares each pixel's
+        light curve with the mean normalized light curve of the targets.
+
+        Args:
+            rows (array): The rows of the target pixels.
+            cols (array): The columns of the target pixels.
+            n (Optional[int]): Number of predictor pixels to use.
+            method (Optional): The method for choosing predictor pixels (see ``CPM.set_predictor_pixels``).
+            exclusion_size (Optional[int]): The size of each target's exclusion region (see ``CPM.set_exclusion``).
+            exclusion_method (Optional): The method for excluding a region (see ``CPM.set_exclusion``).
+            seed (Optional[int]): The seed passed to ``np.random.seed`` before choosing the predictors
+                with the "random" method.
+
+        Returns:
+            The (flattened) indices of the ``n`` predictor pixels.
+        """
+        rows, cols = np.atleast_1d(rows), np.atleast_1d(cols)
+        pixel_rows, pixel_cols = np.divmod(np.arange(self.flux_medians.size), self.cutout_sidelength_y)
+        excluded = _exclusion_mask(
+            pixel_rows, pixel_cols, rows[:, None], cols[:, None], exclusion_size, exclusion_method
+        ).any(axis=0)
+        valid_idx = np.flatnonzero(~excluded)
+        target_idx = rows * self.cutout_sidelength_y + cols
+        if method == "similar_brightness":
+            medians = self.flattened_flux_medians
+            diff = np.abs(medians[valid_idx] - np.nanmedian(medians[target_idx]))
+            return valid_idx[np.argsort(diff, kind="stable")[0:n]]
+        if method == "cosine_similarity":
+            target_lc = self.flattened_normalized_fluxes[:, target_idx].mean(axis=1)
+            cos_sim = np.dot(target_lc, self.flattened_normalized_fluxes[:, valid_idx]) / (
+                np.linalg.norm(target_lc) * self._get_flattened_normalized_flux_norms()[valid_idx]
+            )
+            return valid_idx[np.argsort(cos_sim, kind="stable")[::-1][0:n]]
+        if method == "random":
+            if seed != None:
+                np.random.seed(seed=seed)
+            return np.random.choice(valid_idx, size=n, replace=False)
+        raise ValueError(f"Unknown predictor pixel method: {method}")
+
+    def _similar_brightness_idx(self, row, col, n, exclusion_size=5, exclusion_method="closest"):
+        """Find the ``n`` pixels outside the exclusion region with the median brightness closest to the target pixel's.
+
+        The result is the same as a stable ``np.argsort`` of the absolute median differences over all 
+        non-excluded pixels (ties are broken by pixel index), but only a window of the brightness-sorted pixels 
+        around the target pixel's rank is searched. The window is widened until it is guaranteed to contain the answer.
+        """
+        order, num_finite = self._get_brightness_index()
+        medians = self.flattened_flux_medians
+        target_median = self.flux_medians[row, col]
+        width = n + _num_excluded(
+            row, col, exclusion_size, exclusion_method, self.cutout_sidelength_x, self.cutout_sidelength_y
         )
+        rank = np.searchsorted(medians[order[:num_finite]], target_median)
+        while np.isfinite(target_median):
+            lo, hi = max(0, rank - width), min(num_finite, rank + width)
+            candidates = order[lo:hi]
+            valid = ~_exclusion_mask(
+                *np.divmod(candidates, self.cutout_sidelength_y), row, col, exclusion_size, exclusion_method
+            )
+            candidates = candidates[valid]
+            diff = np.abs(medians[candidates] - target_median)
+            chosen = np.lexsort((candidates, diff))[0:n]
+            if chosen.size == n:
+                # Pixels outside of the window are at least as far in brightness, so none of them may tie.
+                last = diff[chosen[-1]]
+                if ((lo == 0 or np.abs(medians[order[lo - 1]] - target_median) > last) 
+                        and (hi == num_finite or np.abs(medians[order[hi]] - target_median) > last)):
+                    return candidates[chosen]
+            if lo == 0 and hi == num_finite:
+                break
+            width *= 2
+
+        # Not enough pixels with a finite median (or the target's median is NaN), so sort every pixel.
+        valid_idx = np.flatnonzero(~_exclusion_mask(
+            *np.divmod(np.arange(medians.size), self.cutout_sidelength_y), row, col, exclusion_size, exclusion_method
+        ))
+        diff = np.abs(medians[valid_idx] - target_median)
+        return valid_idx[np.argsort(diff, kind="stable")[0:n]]
+
+    def _get_brightness_index(self):
+        # Pixel indices sorted by median brightness (NaN medians last) and the number of finite medians.
+        if self.__dict__.get("brightness_order") is None:
+            self.brightness_order = np.argsort(self.flattened_flux_medians, kind="stable")
+            self.num_finite_flux_medians = np.sum(np.isfinite(self.flattened_flux_medians))
+        return self.brightness_order, self.num_finite_flux_medians
+
+    def _get_flattened_normalized_flux_norms(self):
+        if self.__dict__.get("flattened_normalized_flux_norms") is None:
+            self.flattened_normalized_flux_norms = np.linalg.norm(self.flattened_normalized_fluxes, axis=0)
+        return self.flattened_normalized_flux_norms
+
+    def share(self, directory=None):
+        """Publish the arrays of this object as memory-mapped files so that other processes can use them without copying.
+
+        Args:
+            directory (Optional[str]): The directory to create the scratch files in. 
+                The default is ``/dev/shm`` (shared memory) if it exists, otherwise the system temporary directory.
+
+        Returns:
+            A ``SharedCutoutData`` handle. It is cheap to pickle and ``SharedCutoutData.open()`` 
+            returns a read-only ``CutoutData`` view of the published arrays in any process.
+        """
+        return SharedCutoutData(self, directory)
+
+
+def _exclusion_mask(pixel_rows, pixel_cols, row, col, exclusion_size, exclusion_method):
+    # Same exclusion regions as ``CPM.set_exclusion``, evaluated for arbitrary (broadcastable) pixels and targets.
+    row_distance = np.abs(pixel_rows - row)
+    col_distance = np.abs(pixel_cols - col)
+    if exclusion_method == "closest":
+        return (row_distance <= exclusion_size) & (col_distance <= exclusion_size)
+    if exclusion_method == "cross":
+        return (row_distance <= exclusion_size) | (col_distance <= exclusion_size)
+    if exclusion_method == "row_exclude":
+        return row_distance <= exclusion_size
+    if exclusion_method == "col_exclude":
+        return col_distance <= exclusion_size
+    return np.full(row_distance.shape, False)
+
+
+def _num_excluded(row, col, exclusion_size, exclusion_method, sidelength_x, sidelength_y):
+    # The number of pixels in the exclusion region of ``_exclusion_mask`` without building the mask.
+    num_rows = min(row + exclusion_size + 1, sidelength_x) - max(0, row - exclusion_size)
+    num_cols = min(col + exclusion_size + 1, sidelength_y) - max(0, col - exclusion_size)
+    if exclusion_method == "closest":
+        return num_rows * num_cols
+    if exclusion_method == "cross":
+        return num_rows * sidelength_y + num_cols * sidelength_x - num_rows * num_cols
+    if exclusion_method == "row_exclude":
+        return num_rows * sidelength_y
+    if exclusion_method == "col_exclude":
+        return num_cols * sidelength_x
+    return 0
+
+
+class SharedCutoutData(object):
+    """A handle to a ``CutoutData`` object published as memory-mapped files with ``CutoutData.share()``.
+
+    Only the location of the files and the non-array attributes are pickled, so the handle can be 
+    passed to worker processes. The files are removed with ``cleanup()`` (or when used as a context manager).
+
+    Args:
+        cutout_data (CutoutData): The CutoutData instance to publish.
+        directory (Optional[str]): The directory to create the scratch files in.
+    """
+
+    # These are reshaped views of other arrays and are recreated as views in ``open()``.
+    _views = {
+        "flattened_flux_medians": "flux_medians",
+        "flattened_normalized_fluxes": "normalized_fluxes",
+    }
+
+    def __init__(self, cutout_data, directory=None):
+        if directory is None and os.path.isdir("/dev/shm"):
+            directory = "/dev/shm"
+        self.path = tempfile.mkdtemp(prefix="tess_cpm_", dir=directory)
+        self.array_names = []
+        self.attributes = {"_memmap_cubes": None}
+        if cutout_data.__dict__.get("_memmap_cubes") is not None:
+            for name in CutoutData._lazy_attributes:
+                if name in self._views or name in vars(cutout_data):
+                    continue
+                # Read one cube at a time and not cached on ``cutout_data``, so that 
+                # a ``memmap`` mode object keeps its memory savings after being shared.
+                np.save(os.path.join(self.path, f"{name}.npy"), cutout_data._read_lazy_attribute(name))
+                self.array_names.append(name)
+        for name, value in vars(cutout_data).items():
+            if name in self._views or name in self.attributes:
+                continue
+            if isinstance(value, np.ndarray):
+                np.save(os.path.join(self.path, f"{name}.npy"), value)
+                self.array_names.append(name)
+            else:
+                self.attributes[name] = value
 
-        self.normalized_flux_errors = self.flux_errors / self.flux_medians
+    def open(self):
+        """Create a read-only ``CutoutData`` view of the published arrays without copying them.
+        """
+        cutout_data = CutoutData.__new__(CutoutData)
+        cutout_data.__dict__.update(self.attributes)
+        for name in self.array_names:
+            setattr(cutout_data, name, np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r"))
+        for name, base in self._views.items():
+            if base in self.array_names:
+                base_array = getattr(cutout_data, base)
+                setattr(cutout_data, name, base_array.reshape(base_array.shape[0], -1) if base_array.ndim == 3 
+                        else base_array.reshape(-1))
+        return cutout_data
 
+    def cleanup(self):
+        """Remove the scratch files. Views that are still open in other processes remain valid until closed.
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
 
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *args):
+        self.cleanup()
@@ -0,0 +1,169 @@
+import json
+import time
+import logging
+import tracemalloc
+
+_collector = None
+_condition_numbers = False
+
+
+class JSONLinesCollector(object):
+    """Write each instrumentation record as a line of JSON.
+
+    Args:
+        file (str or file): A path (opened for appending) or an open text file.
+    """
+
+    def __init__(self, file):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, "a") if self._owns_file else file
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record, default=_to_json) + "\n")
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+
+class LoggingCollector(object):
+    """Send each instrumentation record to a ``logging`` logger.
+
+    The record is passed as the message (formatted as JSON) and as the ``tess_cpm`` attribute of the log record.
+
+    Args:
+        logger (Optional[logging.Logger]): The logger. Default is the ``tess_cpm`` logger.
+        level (Optional[int]): The logging level.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logging.getLogger("tess_cpm") if logger is None else logger
+        self.level = level
+
+    def __call__(self, record):
+        self.logger.log(self.level, json.dumps(record, default=_to_json), extra={"tess_cpm": record})
+
+
+class ListCollector(object):
+    """Keep every instrumentation record in memory.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def summary(self):
+        """Get the total duration and number of calls of each stage and the total of each counter.
+        """
+        stages = {}
+        counters = {}
+        for record in self.records:
+            if record["event"] == "stage":
+                stage = stages.setdefault(record["stage"], {"calls": 0, "duration_s": 0.0})
+                stage["calls"] += 1
+                stage["duration_s"] += record["duration_s"]
+            elif record["event"] == "count":
+                counters[record["counter"]] = counters.get(record["counter"], 0) + record["value"]
+        return {"stages": stages, "counters": counters}
+
+
+def set_collector(collector, condition_numbers=False, trace_memory=False):
+    """Enable instrumentation by setting the function that receives the records.
+
+    Every record is a dictionary with an ``"event"`` key:
+        "stage": The ``"duration_s"`` of a stage (e.g., "load", "predictor_selection", "design_matrix",
+            "solve", or "rescale"), and the net ``"bytes_allocated"`` if memory is traced.
+        "count": A ``"counter"`` (e.g., "solves") incremented by ``"value"``.
+        Any other name: A measurement such as "condition_number" (a 1-norm estimate) or "solver_fallback".
+    Records from a pixel model also have its ``"row"`` and ``"col"``.
+
+    Args:
+        collector (callable): Called with each record, e.g., a ``JSONLinesCollector``, ``LoggingCollector``,
+            or ``ListCollector``. Pass ``None`` to disable instrumentation (the default), in which case
+            the instrumented code does no extra work.
+        condition_numbers (Optional[bool]): If ``True``, record the condition number of each solved system.
+            The estimate comes from the Cholesky factor and costs O(d^2) per solve.
+        trace_memory (Optional[bool]): If ``True``, start ``tracemalloc`` so that the bytes allocated by
+            each stage are recorded. Tracing slows down the code. If ``tracemalloc`` is already tracing,
+            the bytes are always recorded.
+
+    Returns:
+        The previous collector.
+    """
+    global _collector, _condition_numbers
+    previous = _collector
+    _collector = collector
+    _condition_numbers = condition_numbers
+    if collector is not None and trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return previous
+
+
+def enabled():
+    """Whether instrumentation is enabled. Use this to skip computing values that are only recorded.
+    """
+    return _collector is not None
+
+
+def condition_numbers_enabled():
+    return _collector is not None and _condition_numbers
+
+
+def record(event, **fields):
+    """Send a record to the collector (if any).
+    """
+    if _collector is not None:
+        fields["event"] = event
+        _collector(fields)
+
+
+def count(counter, value=1, **fields):
+    """Increment a counter.
+    """
+    if _collector is not None:
+        record("count", counter=counter, value=value, **fields)
+
+
+def stage(name, **fields):
+    """Time a stage of the computation, e.g., ``with stage("solve", row=row, col=col): ...``.
+    """
+    if _collector is None:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+class _Stage(object):
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self._memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        duration = time.perf_counter() - self._start
+        if self._memory is not None and tracemalloc.is_tracing():
+            self.fields["bytes_allocated"] = tracemalloc.get_traced_memory()[0] - self._memory
+        record("stage", stage=self.name, duration_s=duration, **self.fields)
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _to_json(value):
+    # Numpy scalars
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
@@ -1,36 +1,54 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import lightkurve as lk
-from matplotlib.gridspec import GridSpec
-from sklearn.model_selection import KFold
-from scipy.linalg import block_diag
 
 from .cutout_data import CutoutData
 from .cpm_model import CPM
 from .poly_model import PolyModel
 from .custom_model import CustomModel
+from .solvers import (
+    kfold_slices, holdout_normal_equations, update_holdout_normal_equations, section_normal_equations, 
+    chunked_holdout_normal_equations, batched_solve, cholesky_solve, ridge_solve, holdout_reg_path, 
+    chunked_holdout_reg_path, cv_reg_path
+)
+from . import instrumentation
 
 
 class PixelModel(object):
     """A pixel model object that can store the different model components for the model used in each target pixel
+
+    Args:
+        cutout_data (CutoutData): A CutoutData instance to obtain the values from.
+        row (int): The row of the target pixel.
+        col (int): The column of the target pixel.
+        chunk_size (Optional[int]): If set, the design matrix is never built. Its normal equations are accumulated 
+            and the predictions are made ``chunk_size`` cadences at a time, reading the predictor pixels from 
+            the cutout as needed. With a ``memmap`` CutoutData, the memory used then depends on ``chunk_size`` 
+            instead of the number of cadences (e.g., for 200-second cadence or multi-sector cutouts). 
+            The results match the default mode up to floating point rounding.
+
+    The pixel models of a ``Source`` also write their values into the source's ``ResultStore``. With 
+    ``holdout_predict(..., copy=False)``, their ``cpm_prediction``, ``cpm_subtracted_flux``, ``poly_model_prediction``, 
+    ``intercept_prediction``, and ``rescaled_cpm_subtracted_flux`` (and the ``split_*`` lists of these) are 
+    views into the store instead of arrays of their own, which saves the allocations but means that the 
+    next holdout fit overwrites them in place.
     """
 
-    def __init__(self, cutout_data, row, col):
+    def __init__(self, cutout_data, row, col, chunk_size=None):
         if isinstance(cutout_data, CutoutData):
             self.cutout_data = cutout_data
         else:
             return
         self.row = row
         self.col = col
+        self.chunk_size = chunk_size
         self.time = self.cutout_data.time
-        self.raw_flux = self.cutout_data.fluxes[:, row, col]
-        self.norm_flux = self.cutout_data.normalized_fluxes[:, row, col]
+        self.raw_flux = self.cutout_data.get_pixel_data("fluxes", row, col)
+        self.norm_flux = self.cutout_data.get_pixel_data("normalized_fluxes", row, col)
         self.median = self.cutout_data.flux_medians[row, col]
         self.cpm = None
         self.poly_model = None
         self.custom_model = None
         self.regs = []
-        self.reg_matrix = None
+        self.reg_vector = None
         self.design_matrix = None
         self.params = None
         self.param_matrix = None
@@ -49,6 +67,10 @@ class PixelModel(object):
         self.split_custom_model_prediction = []
         self.split_cpm_subtracted_flux = []
         self.split_rescaled_cpm_subtracted_flux = []
+        self._result_store = None
+        self._result_store_index = None
+        self._copy_values = True
+        self._holdout_system = None
 
     @property
     def model_components(self):
@@ -85,17 +107,21 @@ class PixelModel(object):
         n=256,
         predictor_method="similar_brightness",
         seed=None,
+        predictor_idx=None,
     ):
         cpm = CPM(self.cutout_data)
-        cpm.set_target_exclusion_predictors(
-            self.row,
-            self.col,
-            exclusion_size=exclusion_size,
-            exclusion_method=exclusion_method,
-            n=n,
-            predictor_method=predictor_method,
-            seed=seed,
-        )
+        with instrumentation.stage("predictor_selection", row=self.row, col=self.col):
+            cpm.set_target_exclusion_predictors(
+                self.row,
+                self.col,
+                exclusion_size=exclusion_size,
+                exclusion_method=exclusion_method,
+                n=n,
+                predictor_method=predictor_method,
+                seed=seed,
+                predictor_idx=predictor_idx,
+                load=self.chunk_size is None,
+            )
         self.cpm = cpm
 
     def remove_cpm_model(self):
@@ -127,44 +153,103 @@ class PixelModel(object):
             if verbose:
                 print(f"Setting {model.name}'s regularization to {reg}")
             model.set_L2_reg(reg)
-        self._create_reg_matrix()
+        self._create_reg_vector()
         self._create_design_matrix()
 
-    def _create_reg_matrix(self):
-        self.reg_matrix = block_diag(*[mod.reg_matrix for mod in self.model_components])
+    def _create_reg_vector(self):
+        # The regularization matrix is diagonal, so only its diagonal is stored.
+        self.reg_vector = np.concatenate([mod.reg_vector for mod in self.model_components])
 
-    def _create_design_matrix(self):
-        self.design_matrix = np.hstack([mod.m for mod in self.model_components])
+    @property
+    def reg_matrix(self):
+        """The (diagonal) regularization matrix, built from ``reg_vector``.
+        """
+        return None if self.reg_vector is None else np.diag(self.reg_vector)
 
-    def fit(self, y=None, m=None, mask=None, save=True, verbose=True):
+    def _create_design_matrix(self):
+        if self.chunk_size is not None:
+            # Rows are read when needed with ``get_design_matrix``.
+            self.design_matrix = None
+            return
+        with instrumentation.stage("design_matrix", row=self.row, col=self.col):
+            self.design_matrix = np.hstack([mod.m for mod in self.model_components])
+            if self.cpm is not None and self.cpm.m is not None and self.cpm.m.base is not self.design_matrix:
+                # The CPM block is replaced by a view of the design matrix so that the pixel only holds one copy of
+                # the predictor light curves. The other blocks are shared by every pixel (see ``CutoutData.get_design_block``).
+                self.cpm.m = self.design_matrix[:, : self.cpm.num_predictor_pixels]
+                self.cpm.normalized_predictor_pixels_fluxes = self.cpm.m
+
+    def get_design_matrix(self, cadences=slice(None)):
+        """Get rows of the design matrix, reading them from the model components if it is not built (see ``chunk_size``).
+
+        Args:
+            cadences (Optional[slice]): The cadences to get. Default is every cadence.
+        """
+        if self.design_matrix is not None:
+            return self.design_matrix[cadences]
+        return np.hstack([mod.get_m(cadences) for mod in self.model_components])
+
+    def _iter_design_matrix(self, start, stop):
+        # Rows ``start`` to ``stop`` of the design matrix, ``chunk_size`` rows at a time.
+        chunk_size = stop - start if self.chunk_size is None else self.chunk_size
+        for chunk_start in range(start, stop, max(chunk_size, 1)):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            yield chunk_start, chunk_stop, self.get_design_matrix(slice(chunk_start, chunk_stop))
+
+    def _values_dtype(self):
+        if self.design_matrix is not None:
+            return self.design_matrix.dtype
+        # The data type the stacked design matrix would have (the CPM rows have the data type of the normalized flux).
+        return np.result_type(self.norm_flux.dtype, *[mod.m.dtype for mod in self.model_components if mod.m is not None])
+
+    def fit(self, y=None, m=None, mask=None, save=True, verbose=True, form="auto"):
+        """Fit the model with L2-regularized least squares.
+
+        Args:
+            y (Optional[array]): The data. Default is the normalized flux of the pixel.
+            m (Optional[array]): The design matrix. Default is the design matrix of the model components.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+            save (Optional[bool]): If ``True``, store the parameters in the model (and its components).
+            verbose (Optional[bool]): If ``True``, print the estimated condition number of the solved system.
+            form (Optional[str]): Solve the "primal" (parameters x parameters) or "dual" (data points x data points) 
+                system, or pick the cheaper one with "auto" (see ``solvers.ridge_solve``).
+        """
         if self.regs == []:
             print("Please set the L-2 regularizations first.")
             return
-        # self._create_reg_matrix()
+        # self._create_reg_vector()
         # self._create_design_matrix()
         if y is None:
-            print("Fitting using full light curve.")
             y = self.norm_flux
+        chunked = m is None and self.design_matrix is None
         if m is None:
-            print("Fitting using full light curve.")
             m = self.design_matrix
         if mask is None:
             mask = np.full(y.shape, True)
         elif mask is not None and verbose:
             print(f"Using user-provided mask. Clipping {np.sum(~mask)} points.")  # pylint: disable=invalid-unary-operand-type
-        y = y[mask]
-        m = m[mask]
-
-        a = np.dot(m.T, m) + self.reg_matrix
-        b = np.dot(m.T, y)
-        if verbose:
-            print(f"Numpy Defined Condition Number: {np.linalg.cond(a)}")
-            # eigvals, eigvecs = np.linalg.eigh(a)
-            # eigvals = eigvals[np.nonzero(eigvals)]
-            # max_eigval, min_eigval = eigvals.max(), eigvals.min()
-            # eigval_ratio = max_eigval / min_eigval
-            # print(f"Eigenvalue Ratio Condition Number: {eigval_ratio:.2f} (Max: {max_eigval:.2f}, Min: {min_eigval:.2f})")
-        params = np.linalg.solve(a, b)
+
+        condition = verbose or instrumentation.condition_numbers_enabled()
+        with instrumentation.stage("solve", row=self.row, col=self.col):
+            if chunked:
+                # The normal equations are accumulated from chunks of the design matrix (see ``chunk_size``).
+                a, b = section_normal_equations(y, self._design_matrix_rows, [(0, y.size)], mask, self.chunk_size)
+                a, b = a[0], b[0]
+                a[np.diag_indices_from(a)] += self.reg_vector
+                params, info = cholesky_solve(a, b, condition)
+                info["form"] = "primal"
+            else:
+                # The products follow the design matrix precision, but the system is always solved in float64.
+                params, info = ridge_solve(y[mask], m[mask], self.reg_vector, form, condition)
+        instrumentation.count("solves", form=info["form"], row=self.row, col=self.col)
+        if "condition_number" in info:
+            instrumentation.record("condition_number", value=float(info["condition_number"]), row=self.row, col=self.col)
+            if verbose:
+                print(f"Estimated Condition Number: {info['condition_number']}")
+        if "reason" in info:
+            instrumentation.record("solver_fallback", solver=info["solver"], reason=info["reason"], row=self.row, col=self.col)
+            if verbose:
+                print(f"Cholesky factorization failed ({info['reason']}). Solved with {info['solver']} instead.")
         if save:
             self.params = params
             # Hardcoded! Not ideal.
@@ -174,11 +259,32 @@ class PixelModel(object):
                 self.poly_model.params = self.params[self.cpm.num_predictor_pixels :]
         return params
 
-    def holdout_fit(self, k=10, mask=None, verbose=True):
+    def holdout_fit(self, k=10, mask=None, verbose=True, downdate=False, form="auto", incremental=False, 
+                    max_changed_fraction=0.25):
+        """Fit the model ``k`` times, each time holding out one contiguous section of the light curve.
+
+        Args:
+            k (Optional[int]): The number of sections to split the light curve into.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+            verbose (Optional[bool]): If ``True``, print information about each fit.
+            downdate (Optional[bool]): If ``True``, compute the full data ``m.T m`` and ``m.T y`` once and 
+                subtract each section's contribution instead of recomputing the products for every training set.
+                This always solves the primal form. This is always done if ``chunk_size`` is set, in which case 
+                the returned test design matrices are ``None``.
+            form (Optional[str]): The form of the system solved by ``fit`` ("primal", "dual", or "auto").
+            incremental (Optional[bool]): If ``True``, keep the normal equations of the training sets and, 
+                on the next incremental fit with a different ``mask``, only add and subtract the contributions 
+                of the data points that changed (see ``holdout_normal_equations``). 
+                This makes repeated fits while clipping outliers nearly as cheap as a single fit.
+            max_changed_fraction (Optional[float]): In incremental fits, rebuild the normal equations instead 
+                of updating them if more than this fraction of the data points changed.
+        """
         if self.regs == []:
             print("Please set the L-2 regularizations first.")
             return
 
+        if incremental or self.design_matrix is None:
+            downdate = True
         if mask is None:
             mask = np.full(self.time.shape, True)
         # time = self.time[mask]
@@ -191,48 +297,293 @@ class PixelModel(object):
         times = []
         y_tests = []
         m_test_matrix = []
-        param_matrix = np.zeros((k, m.shape[1]))
-
-        kf = KFold(k)
-        i = 0
-        for train, test in kf.split(y):
-            y_train, y_test = y[train], y[test]
-            m_train, m_test = m[train], m[test]
+        param_matrix = np.zeros((k, self.reg_vector.size))
+
+        if downdate:
+            slices = kfold_slices(y.size, k)
+            with instrumentation.stage("solve", row=self.row, col=self.col):
+                a, b = self.holdout_normal_equations(k, mask, incremental, max_changed_fraction)
+                param_matrix, infos = batched_solve(a, b, return_info=True)
+            instrumentation.count("solves", k, row=self.row, col=self.col)
+            for section, info in infos.items():
+                if "reason" in info:
+                    instrumentation.record("solver_fallback", solver=info["solver"], reason=info["reason"], 
+                                           row=self.row, col=self.col, section=section)
+                    if verbose:
+                        print(f"Cholesky factorization failed ({info['reason']}). Solved with {info['solver']} instead.")
+            for start, stop in slices:
+                times.append(time[start:stop])
+                y_tests.append(y[start:stop])
+                m_test_matrix.append(None if m is None else m[start:stop])
+            self.split_time = times
+            self.split_fluxes = y_tests
+            return (times, y_tests, m_test_matrix, param_matrix)
+
+        for i, (start, stop) in enumerate(kfold_slices(y.size, k)):
+            train = np.full(y.shape, True)
+            train[start:stop] = False
+            y_train, y_test = y[train], y[start:stop]
+            m_train, m_test = m[train], m[start:stop]
             mask_train = mask[train]
-            times.append(time[test])
+            times.append(time[start:stop])
             y_tests.append(y_test)
             m_test_matrix.append(m_test)
-            params = self.fit(y_train, m_train, mask=mask_train, save=False, verbose=verbose)
+            params = self.fit(y_train, m_train, mask=mask_train, save=False, verbose=verbose, form=form)
             param_matrix[i] = params
-            i += 1
         self.split_time = times
         self.split_fluxes = y_tests
         return (times, y_tests, m_test_matrix, param_matrix)
 
-    def holdout_fit_predict(self, k=10, mask=None, save=True, verbose=False):
+    def holdout_fit_predict(self, k=10, mask=None, save=True, verbose=False, downdate=False, incremental=False, 
+                            copy=True):
+        times, y_tests, m_tests, param_matrix = self.holdout_fit(
+            k, mask, verbose=verbose, downdate=downdate, incremental=incremental
+        )
+        return self.holdout_predict(param_matrix, kfold_slices(self.time.size, k), copy)
+
+    def holdout_normal_equations(self, k=10, mask=None, incremental=False, max_changed_fraction=0.25):
+        """Get the regularized normal equations of each holdout training set.
+
+        Args:
+            k (Optional[int]): The number of sections to split the light curve into.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+            incremental (Optional[bool]): If ``True``, update the normal equations from the previous incremental call 
+                for the data points whose ``mask`` value changed, and keep the result for the next call. The normal 
+                equations are rebuilt if there are none to update (e.g., the first call or after ``set_regs``) 
+                or if more than ``max_changed_fraction`` of the data points changed. Without a design matrix 
+                (see ``chunk_size``), the normal equations are always rebuilt.
+            max_changed_fraction (Optional[float]): See ``incremental``.
+
+        Returns:
+            The left-hand sides (k, d, d) and right-hand sides (k, d) (see ``solvers.holdout_normal_equations``).
+        """
+        if mask is None:
+            mask = np.full(self.time.shape, True)
+        slices = kfold_slices(self.time.size, k)
+        system = self._holdout_system
+        if self.design_matrix is None:
+            a, b = chunked_holdout_normal_equations(
+                self.norm_flux, self._design_matrix_rows, self.reg_vector, slices, mask, self.chunk_size
+            )
+        elif (
+            incremental and system is not None and system["k"] == k
+            and system["design_matrix"] is self.design_matrix and system["reg_vector"] is self.reg_vector
+            and np.count_nonzero(mask != system["mask"]) <= max_changed_fraction * mask.size
+        ):
+            a, b = system["a"], system["b"]
+            update_holdout_normal_equations(a, b, self.norm_flux, self.design_matrix, slices, system["mask"], mask)
+            instrumentation.count("incremental_updates", row=self.row, col=self.col)
+        else:
+            a, b = holdout_normal_equations(self.norm_flux, self.design_matrix, self.reg_vector, slices, mask, downdate=True)
+        if incremental and self.design_matrix is not None:
+            self._holdout_system = {
+                "k": k, "mask": mask.copy(), "design_matrix": self.design_matrix, "reg_vector": self.reg_vector, "a": a, "b": b
+            }
+        return a, b
+
+    def _design_matrix_rows(self, start, stop):
+        return self.get_design_matrix(slice(start, stop))
+
+    def holdout_reg_path(self, cpm_regs, k=10, mask=None):
+        """Perform the ``k``-fold holdout fit for a grid of CPM regularization values.
+
+        The regularizations of the other model components are kept at the values given in ``set_regs``.
+        Each section's system is factorized once (see ``solvers.holdout_reg_path``), so the cost 
+        is close to that of a single ``holdout_fit`` regardless of the number of values.
+        With ``chunk_size``, the systems are accumulated from chunks of the design matrix instead.
+
+        Args:
+            cpm_regs (array): The CPM regularization values.
+            k (Optional[int]): The number of sections to split the light curve into.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+
+        Returns:
+            The parameters (len(cpm_regs), k, d) for each CPM regularization value and section.
+        """
+        if self.regs == []:
+            print("Please set the L-2 regularizations first.")
+            return
+        if self.cpm is None:
+            print("Please add the CPM model first.")
+            return
+        swept = np.full(self.reg_vector.size, False)
+        swept[: self.cpm.num_predictor_pixels] = True
+        slices = kfold_slices(self.time.size, k)
+        if self.design_matrix is None:
+            return chunked_holdout_reg_path(
+                self.norm_flux, self._design_matrix_rows, self.reg_vector, swept, cpm_regs, slices, mask, self.chunk_size
+            )
+        return holdout_reg_path(self.norm_flux, self.design_matrix, self.reg_vector, swept, cpm_regs, slices, mask)
+
+    def cv_reg_path(self, cpm_regs, mask=None):
+        """Get the leave-one-out and generalized cross-validation errors for a grid of CPM regularization values.
+
+        The regularizations of the other model components are kept at the values given in ``set_regs``.
+        Both errors are exact and are computed in closed form from a single eigendecomposition 
+        (see ``solvers.cv_reg_path``), without refitting for each value.
+
+        Args:
+            cpm_regs (array): The CPM regularization values.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used.
+
+        Returns:
+            The mean squared leave-one-out errors and generalized cross-validation errors (len(cpm_regs),).
+        """
+        if self.regs == []:
+            print("Please set the L-2 regularizations first.")
+            return
+        if self.cpm is None:
+            print("Please add the CPM model first.")
+            return
+        if self.design_matrix is None:
+            print("The regularization path needs the design matrix, which is not built with chunk_size.")
+            return
+        swept = np.full(self.design_matrix.shape[1], False)
+        swept[: self.cpm.num_predictor_pixels] = True
+        with instrumentation.stage("cv_reg_path", row=self.row, col=self.col):
+            return cv_reg_path(self.norm_flux, self.design_matrix, self.reg_vector, swept, cpm_regs, mask)
+
+    def select_cpm_reg(self, cpm_regs, criterion="loo", mask=None):
+        """Find the CPM regularization value that minimizes the leave-one-out or generalized cross-validation error.
+
+        The model is not changed. Use ``set_regs`` to apply the selected value.
+
+        Args:
+            cpm_regs (array): The CPM regularization values to try.
+            criterion (Optional[str]): "loo" for the leave-one-out error or "gcv" for the generalized cross-validation error.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used.
+
+        Returns:
+            The selected value and the errors (len(cpm_regs),) for each value.
+        """
+        cpm_regs = np.atleast_1d(cpm_regs)
+        errors = self.cv_reg_path(cpm_regs, mask)
+        if errors is None:
+            return
+        errors = errors[["loo", "gcv"].index(criterion)]
+        return cpm_regs[np.argmin(errors)], errors
+
+    def holdout_predict(self, param_matrix, slices, copy=True):
+        """Make the holdout predictions given the parameters fit for each section.
+
+        This is split from ``holdout_fit_predict`` so that parameters obtained elsewhere 
+        (e.g., with ``Source.holdout_fit_predict(batched=True)``) can be written back to this pixel model.
+
+        Args:
+            param_matrix (array): The parameters (k, d) fit for each section, where the ``j``-th row was
+                fit without using the data in the ``j``-th section.
+            slices (list): The ``(start, stop)`` index of each section (see ``solvers.kfold_slices``).
+            copy (Optional[bool]): If ``False`` and a result store is attached, the predictions are written directly 
+                into the store and the prediction attributes are views into it, which the next fit overwrites. 
+                Otherwise they are arrays of their own (and are copied into the store).
+        """
         self._reset_values()
-        times, y_tests, m_tests, param_matrix = self.holdout_fit(k, mask, verbose=verbose)
-        predictions = [np.dot(m, param) for m, param in zip(m_tests, param_matrix)]
-        self.split_prediction = predictions
-        self.prediction = np.concatenate(predictions)
-        for m, param in zip(m_tests, param_matrix):
+        self._copy_values = copy
+        times = [self.time[start:stop] for start, stop in slices]
+        y_tests = [self.norm_flux[start:stop] for start, stop in slices]
+        self.split_time = times
+        self.split_fluxes = y_tests
+        self.param_matrix = param_matrix
+        if self._result_store is not None:
+            self._result_store.slices = list(slices)
+        if self.cutout_data.dtype is not None:
+            # The parameters are solved for in double precision but the predictions follow the data type policy.
+            param_matrix = param_matrix.astype(self.cutout_data.dtype, copy=False)
+        # The values are written section by section (and, with ``chunk_size``, chunk by chunk) into full length 
+        # arrays (views into the result store with ``copy=False``) and the split values are views of these arrays.
+        self.prediction = np.empty(self.time.size, dtype=self._values_dtype())
+        if self.cpm is not None:
+            self.cpm_prediction = self._result_array("cpm_prediction")
+            self.cpm_subtracted_flux = self._result_array("cpm_subtracted_flux")
+        if self.poly_model is not None:
+            self.poly_model_prediction = self._result_array("poly_model_prediction")
+            self.intercept_prediction = self._result_array("intercept_prediction")
+        for (start, stop), param in zip(slices, param_matrix):
+            for chunk_start, chunk_stop, m in self._iter_design_matrix(start, stop):
+                chunk = slice(chunk_start, chunk_stop)
+                self.prediction[chunk] = np.dot(m, param)
+                if self.cpm is not None:
+                    m_cpm, param_cpm = m[:, : self.cpm.num_predictor_pixels], param[: self.cpm.num_predictor_pixels]
+                    self.cpm_prediction[chunk] = np.dot(m_cpm, param_cpm)
+                if self.poly_model is not None:
+                    m_poly, param_poly = m[:, self.cpm.num_predictor_pixels :], param[self.cpm.num_predictor_pixels :]
+                    self.poly_model_prediction[chunk] = np.dot(m_poly, param_poly)
+                    self.intercept_prediction[chunk] = np.multiply(m_poly[:,-1], param_poly[-1])
+            self.split_prediction.append(self.prediction[start:stop])
             if self.cpm is not None:
-                m_cpm, param_cpm = m[:, : self.cpm.num_predictor_pixels], param[: self.cpm.num_predictor_pixels]
-                self.split_cpm_prediction.append(np.dot(m_cpm, param_cpm))
+                self.split_cpm_prediction.append(self.cpm_prediction[start:stop])
             if self.poly_model is not None:
-                m_poly, param_poly = m[:, self.cpm.num_predictor_pixels :], param[self.cpm.num_predictor_pixels :]
-                self.split_poly_model_prediction.append(np.dot(m_poly, param_poly))
-                self.split_intercept_prediction.append(np.multiply(m_poly[:,-1], param_poly[-1]))
-        self.split_cpm_subtracted_flux = [y-cpm for y, cpm in zip(self.split_fluxes, self.split_cpm_prediction)]
+                self.split_poly_model_prediction.append(self.poly_model_prediction[start:stop])
+                self.split_intercept_prediction.append(self.intercept_prediction[start:stop])
+        predictions = self.split_prediction
+        for (start, stop), y, cpm in zip(slices, self.split_fluxes, self.split_cpm_prediction):
+            self.cpm_subtracted_flux[start:stop] = y - cpm
+            self.split_cpm_subtracted_flux.append(self.cpm_subtracted_flux[start:stop])
+        if self.cpm is not None:
+            self._write_result_store("cpm_prediction", "cpm_subtracted_flux")
+        if self.poly_model is not None:
+            self._write_result_store("poly_model_prediction", "intercept_prediction")
         # self.split_cpm_subtracted_flux = [y-cpm-param_poly[0] for y, cpm in zip(self.split_fluxes, self.split_cpm_prediction)]  # just to fix plot for presentation
+        return (times, y_tests, predictions)
 
-        self.cpm_subtracted_flux = np.concatenate(self.split_cpm_subtracted_flux)
-        self.cpm_prediction = np.concatenate(self.split_cpm_prediction)
+    def _set_result_store(self, store, row, col):
+        """Write the values of this pixel model into ``store`` at position (``row``, ``col``) of the aperture.
+        """
+        self._result_store = store
+        self._result_store_index = (row, col)
+        store.pixel_view("raw", row, col)[:] = self.raw_flux
+        store.pixel_view("normalized_flux", row, col)[:] = self.norm_flux
+
+    def _result_array(self, data_type):
+        if self._result_store is None or self._copy_values:
+            return np.empty(self.time.size, dtype=self._values_dtype())
+        return self._result_store.pixel_view(data_type, *self._result_store_index)
+
+    def _write_result_store(self, *data_types):
+        # With ``copy``, the values are arrays of their own and are copied into the store afterwards.
+        if self._result_store is not None and self._copy_values:
+            for data_type in data_types:
+                self._result_store.pixel_view(data_type, *self._result_store_index)[:] = getattr(self, data_type)
+
+    def _get_spec(self):
+        """Get a lightweight description of this pixel model that can be sent to another process.
+        """
+        spec = {
+            "row": self.row, "col": self.col, "chunk_size": self.chunk_size, "regs": list(self.regs), 
+            "cpm": None, "poly_model": None, "custom_model": None,
+        }
+        if self.cpm is not None:
+            loc = self.cpm.locations_predictor_pixels.T
+            spec["cpm"] = {
+                "exclusion_size": self.cpm.exclusion_size,
+                "exclusion_method": self.cpm.method_exclusion,
+                "method": self.cpm.method_choose_predictor_pixels,
+                "n": self.cpm.num_predictor_pixels,
+                "idx": loc[0] * self.cutout_data.cutout_sidelength_y + loc[1],  # pylint: disable=unsubscriptable-object
+            }
         if self.poly_model is not None:
-            self.poly_model_prediction = np.concatenate(self.split_poly_model_prediction)
-            self.intercept_prediction = np.concatenate(self.split_intercept_prediction)
-        self.param_matrix = param_matrix
-        return (times, y_tests, predictions)
+            spec["poly_model"] = {"scale": self.poly_model.scale, "num_terms": self.poly_model.num_terms}
+        if self.custom_model is not None:
+            spec["custom_model"] = {"flux": self.custom_model.m[:, 0]}
+        return spec
+
+    @classmethod
+    def _from_spec(cls, cutout_data, spec):
+        """Rebuild a pixel model from the description returned by ``_get_spec``.
+        """
+        model = cls(cutout_data, spec["row"], spec["col"], spec["chunk_size"])
+        if spec["cpm"] is not None:
+            model.add_cpm_model(
+                spec["cpm"]["exclusion_size"], spec["cpm"]["exclusion_method"], spec["cpm"]["n"], 
+                spec["cpm"]["method"], predictor_idx=spec["cpm"]["idx"]
+            )
+        if spec["poly_model"] is not None:
+            model.add_poly_model(**spec["poly_model"])
+        if spec["custom_model"] is not None:
+            model.add_custom_model(spec["custom_model"]["flux"])
+        if spec["regs"]:
+            model.set_regs(spec["regs"], verbose=False)
+        return model
 
     def _reset_values(self):
         self.split_time = []
@@ -247,16 +598,25 @@ class PixelModel(object):
 
     def rescale(self):
         # self.split_rescaled_cpm_subtracted_flux = [(flux + 1) * self.median for flux in self.split_cpm_subtracted_flux]
-        if self.poly_model is not None:
-            self.split_rescaled_cpm_subtracted_flux = [(dt_flux-inter+1) * self.median for dt_flux, inter in zip(self.split_cpm_subtracted_flux, self.split_intercept_prediction)]
-        else:
-            self.split_rescaled_cpm_subtracted_flux = [(dt_flux+1) * self.median for dt_flux in self.split_cpm_subtracted_flux]
-        self.rescaled_cpm_subtracted_flux = np.concatenate(self.split_rescaled_cpm_subtracted_flux)
+        with instrumentation.stage("rescale", row=self.row, col=self.col):
+            self.rescaled_cpm_subtracted_flux = self._result_array("rescaled_cpm_subtracted_flux")
+            if self.poly_model is not None:
+                self.rescaled_cpm_subtracted_flux[:] = (self.cpm_subtracted_flux - self.intercept_prediction + 1) * self.median
+            else:
+                self.rescaled_cpm_subtracted_flux[:] = (self.cpm_subtracted_flux + 1) * self.median
+            bounds = np.cumsum([0] + [flux.size for flux in self.split_cpm_subtracted_flux])
+            self.split_rescaled_cpm_subtracted_flux = [
+                self.rescaled_cpm_subtracted_flux[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            self._write_result_store("rescaled_cpm_subtracted_flux")
 
     def plot_model(self, size_predictors=2):
         return self.cpm.plot_model(size_predictors=size_predictors)
 
     def summary_plot(self, figsize=(16, 5.5), zeroing=True, show_location=False, size_predictors=10):
+        import matplotlib.pyplot as plt
+        from matplotlib.gridspec import GridSpec
+
         fig = plt.figure(figsize=figsize)
         gs = GridSpec(2, 5, hspace=0)
 
@@ -305,4 +665,16 @@ class PixelModel(object):
 
 
         plt.show()
-        return fig, [ax1, ax2, ax3]
\ No newline at end of file
+        return fig, [ax1, ax2, ax3]
+
+
+def _shared_holdout_fit(shared_cutout_data, spec, k=10, mask=None, downdate=False):
+    """Rebuild a pixel model on a shared ``CutoutData`` view and return its holdout fit parameters.
+
+    This is a module level function so that it can be used by worker processes (see ``Source.holdout_fit_predict``).
+    """
+    # Records are collected in the parent process (see ``Source._parallel_holdout_fit``).
+    instrumentation.set_collector(None)
+    model = PixelModel._from_spec(shared_cutout_data.open(), spec)
+    _, _, _, param_matrix = model.holdout_fit(k, mask, verbose=False, downdate=downdate)
+    return param_matrix
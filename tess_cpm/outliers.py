@@ -0,0 +1,69 @@
+import numpy as np
+
+
+def rolling_median(x, window, axis=0):
+    """Compute the rolling (running) median of one or many light curves.
+
+    Args:
+        x (array): The light curve(s).
+        window (int): The number of data points in the window.
+        axis (Optional[int]): The time axis of ``x``.
+
+    Returns:
+        The rolling median, with the same shape as ``x``.
+    """
+    from scipy.ndimage import median_filter
+
+    x = np.moveaxis(np.asarray(x), axis, -1)
+    flat = x.reshape(-1, x.shape[-1])
+    median = np.empty_like(flat)
+    # Filtering each light curve separately uses SciPy's running median for 1-D input, which costs
+    # O(log(window)) per data point. Filtering a multidimensional array along one axis does not,
+    # and is much slower for large windows.
+    for i, lc in enumerate(flat):
+        median[i] = median_filter(lc, size=window)
+    return np.moveaxis(median.reshape(x.shape), -1, axis)
+
+
+def sigma_clip(x, window=50, sigma=5, sigma_upper=None, sigma_lower=None, maxiters=10, axis=0):
+    """Find the outliers of one or many light curves with iterative sigma clipping around a rolling median.
+
+    The rolling median is subtracted from each light curve. The residuals are then clipped repeatedly, each time
+    estimating their center (median) and scale (1.4826 times the median absolute deviation) from only the
+    data points that are not yet clipped, until the clipped data points stop changing or ``maxiters`` is reached.
+    Where the median absolute deviation is zero, the standard deviation is used as the scale instead.
+    NaN values are ignored and never flagged.
+
+    Args:
+        x (array): The light curve(s), e.g., an aperture light curve (T,) or a detrended cube (T, rows, cols).
+        window (Optional[int]): The number of data points in the rolling median window.
+        sigma (Optional[float]): The number of standard deviations to clip at.
+        sigma_upper (Optional[float]): The number of standard deviations above the median to clip at. Default is ``sigma``.
+        sigma_lower (Optional[float]): The number of standard deviations below the median to clip at. Default is ``sigma``.
+        maxiters (Optional[int]): The maximum number of clipping iterations.
+        axis (Optional[int]): The time axis of ``x``.
+
+    Returns:
+        Boolean array with the same shape as ``x`` that is ``True`` for the outliers.
+    """
+    if sigma_upper is None:
+        sigma_upper = sigma
+    if sigma_lower is None:
+        sigma_lower = sigma
+    residuals = np.asarray(x, dtype=float) - rolling_median(x, window, axis)
+    outliers = np.full(residuals.shape, False)
+    for _ in range(maxiters):
+        unclipped = np.where(outliers, np.nan, residuals)
+        center = np.nanmedian(unclipped, axis=axis, keepdims=True)
+        scale = 1.4826 * np.nanmedian(np.abs(unclipped - center), axis=axis, keepdims=True)
+        # More than half of the residuals are equal (e.g., a flat or quantized light curve), so the median 
+        # absolute deviation would clip every other data point. Use the standard deviation there instead.
+        flat = scale == 0
+        if np.any(flat):
+            scale = np.where(flat, np.nanstd(unclipped, axis=axis, keepdims=True), scale)
+        deviation = residuals - center
+        clipped = (deviation > sigma_upper * scale) | (deviation < -sigma_lower * scale)
+        if np.array_equal(clipped, outliers):
+            break
+        outliers = clipped
+    return outliers
@@ -0,0 +1,326 @@
+"""Run the CPM detrending on a table of targets, e.g., ``tess-cpm-pipeline targets.csv output/ --processes 8``.
+
+The cutout of each target (a row of the table) is fetched into the ``CutoutCache`` by the main process, and the target
+then goes through ``Source``, ``set_aperture``, ``add_cpm_model`` (and ``add_poly_model``), ``set_regs``,
+``holdout_fit_predict``, and ``get_aperture_lc`` in a worker process. The aperture light curves of the
+finished targets are written in bulk to ``part-*.npz`` files, and every finished (or failed) target is recorded in
+``status.jsonl``. Running the pipeline again with the same output directory skips the recorded targets, so a killed
+job resumes where it left off. Use ``load_results`` to read the light curves back.
+"""
+import os
+import csv
+import json
+import time
+import uuid
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+from .cutout_cache import CutoutCache, DirectoryFetcher
+from .result_cache import ResultCache
+from .source import Source
+
+STATUS_FILE = "status.jsonl"
+
+
+def read_targets(path):
+    """Read a table of targets from a CSV file.
+
+    The ``ra`` and ``dec`` (in degrees) and ``sector`` columns are required. An optional ``name`` column
+    is used as the target's key, which otherwise is ``<ra>_<dec>_s<sector>``. An optional ``size`` column
+    overrides the pipeline's cutout size.
+
+    Returns:
+        A list of target dictionaries.
+    """
+    targets = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): value.strip() for key, value in row.items() if key is not None}
+            target = {"ra": float(row["ra"]), "dec": float(row["dec"]), "sector": int(row["sector"])}
+            if row.get("size"):
+                target["size"] = int(row["size"])
+            target["key"] = row.get("name") or f"{target['ra']:.6f}_{target['dec']:.6f}_s{target['sector']}"
+            targets.append(target)
+    return targets
+
+
+class Pipeline(object):
+    """A batch run of the CPM detrending over many targets.
+
+    Args:
+        size (Optional[int]): The cutout sidelength in pixels.
+        halfwidth (Optional[int]): The aperture is the square of (2 * ``halfwidth`` + 1) pixels at the cutout center.
+        regs (Optional[list]): The regularization values passed to ``set_regs`` (one per model component).
+        n (Optional[int]): The number of predictor pixels.
+        predictor_method (Optional[str]): The predictor pixel method (see ``CPM.set_predictor_pixels``).
+        exclusion_size (Optional[int]): The size of the exclusion region (see ``CPM.set_exclusion``).
+        poly (Optional[bool]): If ``True``, add a polynomial model.
+        k (Optional[int]): The number of sections used by ``holdout_fit_predict``.
+        data_types (Optional[list]): The aperture light curves to save (see ``Source.get_aperture_lc``).
+        weighting (Optional[str]): The weighting passed to ``get_aperture_lc``.
+        cache_dir (Optional[str]): The ``CutoutCache`` directory. Default is the cache's default directory.
+        cutout_dir (Optional[str]): If set, the cutouts are taken from this directory of TessCut files
+            (see ``DirectoryFetcher``) instead of MAST.
+        offline (Optional[bool]): If ``True``, only use the cached cutouts.
+        result_cache_dir (Optional[str]): If set, the fits are cached in (and reused from) a ``ResultCache`` in this directory.
+        memmap (Optional[bool]): Passed to ``Source``.
+        chunk_size (Optional[int]): Passed to ``set_aperture``.
+        batch_size (Optional[int]): The number of finished targets written to each results file.
+        processes (Optional[int]): The number of worker processes. Default is the number of CPUs.
+    """
+
+    def __init__(self, size=64, halfwidth=1, regs=(0.1, 0.1), n=256, predictor_method="similar_brightness",
+                 exclusion_size=5, poly=True, k=10, data_types=("cpm_subtracted_flux",), weighting=None,
+                 cache_dir=None, cutout_dir=None, offline=False, result_cache_dir=None, memmap=False, chunk_size=None,
+                 batch_size=100, processes=None):
+        self.config = {
+            "size": size, "halfwidth": halfwidth, "regs": list(regs), "n": n, "predictor_method": predictor_method,
+            "exclusion_size": exclusion_size, "poly": poly, "k": k, "data_types": list(data_types),
+            "weighting": weighting, "cache_dir": cache_dir, "cutout_dir": cutout_dir, "offline": offline,
+            "result_cache_dir": result_cache_dir, "memmap": memmap, "chunk_size": chunk_size,
+        }
+        self.batch_size = batch_size
+        self.processes = processes
+
+    def run(self, targets, output_dir, retry_failed=False, verbose=True):
+        """Process the targets that are not finished yet in ``output_dir``.
+
+        Each target's cutout is fetched in this process when the target is submitted to a free worker, 
+        so that only this process updates the cutout cache. A target whose cutout cannot be fetched or that raises an exception 
+        is recorded as failed with the error message. If a worker process 
+        crashes (e.g., it runs out of memory), the targets in progress at the time are recorded as failed and the 
+        worker processes are restarted. Failed targets are skipped on later runs unless ``retry_failed`` is ``True``.
+
+        Args:
+            targets (list): The target dictionaries (see ``read_targets``).
+            output_dir (str): The directory for the results and the status of each target.
+            retry_failed (Optional[bool]): If ``True``, also process the targets that failed in previous runs.
+            verbose (Optional[bool]): If ``True``, print the progress.
+
+        Returns:
+            The number of targets that finished and that failed in this run.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        statuses = read_status(output_dir)
+        skip = {key for key, status in statuses.items() if status["status"] == "done" or not retry_failed}
+        todo = [target for target in targets if target["key"] not in skip]
+        if verbose:
+            print(f"{len(targets) - len(todo)} of {len(targets)} targets already processed.")
+
+        num_done = num_failed = 0
+        finished = []
+        start = time.perf_counter()
+        pending = iter(todo)
+        # Only one target per worker is submitted at a time, so a crashed worker fails as few targets as possible.
+        max_in_flight = self.processes or os.cpu_count() or 1
+        in_flight = {}
+        cache = _cutout_cache(self.config)
+        executor = ProcessPoolExecutor(max_workers=self.processes)
+        try:
+            while True:
+                results = []
+                while len(in_flight) < max_in_flight:
+                    target = next(pending, None)
+                    if target is None:
+                        break
+                    path, error = _fetch_cutout(cache, target, self.config)
+                    if error is not None:
+                        results.append((target, {"status": "failed", "error": error}))
+                        continue
+                    in_flight[executor.submit(_process_target, target, path, self.config)] = (target, executor)
+                if not in_flight and not results:
+                    break
+                done = wait(in_flight, return_when=FIRST_COMPLETED)[0] if in_flight else ()
+                for future in done:
+                    target, target_executor = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        result = {"status": "failed", "error": "A worker process terminated abruptly."}
+                        if target_executor is executor:
+                            executor.shutdown(wait=False)
+                            executor = ProcessPoolExecutor(max_workers=self.processes)
+                    results.append((target, result))
+                for target, result in results:
+                    if result["status"] == "done":
+                        finished.append((target, result))
+                        num_done += 1
+                        if len(finished) >= self.batch_size:
+                            _write_part(output_dir, finished)
+                            finished = []
+                    else:
+                        _append_status(output_dir, [dict(key=target["key"], status="failed", error=result["error"])])
+                        num_failed += 1
+                    if verbose:
+                        elapsed = time.perf_counter() - start
+                        print(f"{num_done + num_failed}/{len(todo)} targets ({num_failed} failed), "
+                              f"{(num_done + num_failed) / elapsed:.2f} targets/s")
+        finally:
+            executor.shutdown()
+            # The finished targets are saved even if the run is interrupted.
+            if finished:
+                _write_part(output_dir, finished)
+        return num_done, num_failed
+
+
+def _cutout_cache(config):
+    fetcher = None if config["cutout_dir"] is None else DirectoryFetcher(config["cutout_dir"])
+    return CutoutCache(config["cache_dir"], offline=config["offline"], fetcher=fetcher)
+
+
+def _fetch_cutout(cache, target, config):
+    """Get the path to a target's cutout, fetching it into the cache if needed.
+
+    Returns:
+        The path and ``None``, or ``None`` and the error if the cutout could not be fetched.
+    """
+    try:
+        size = target.get("size", config["size"])
+        return cache.get(target["ra"], target["dec"], size=size, sector=target["sector"])[0], None
+    except Exception:
+        return None, traceback.format_exc(limit=5)
+
+
+def _process_target(target, path, config):
+    """Detrend a single target from its cutout at ``path`` and return its aperture light curves (or the error).
+
+    This is a module level function so that it can be used by worker processes.
+    """
+    try:
+        s = Source(path, verbose=False, memmap=config["memmap"])
+        center_row = s.cutout_data.cutout_sidelength_x // 2
+        center_col = s.cutout_data.cutout_sidelength_y // 2
+        halfwidth = config["halfwidth"]
+        s.set_aperture(rowlims=[center_row - halfwidth, center_row + halfwidth],
+                       collims=[center_col - halfwidth, center_col + halfwidth], chunk_size=config["chunk_size"])
+        s.add_cpm_model(exclusion_size=config["exclusion_size"], n=config["n"], predictor_method=config["predictor_method"])
+        if config["poly"]:
+            s.add_poly_model()
+        s.set_regs(config["regs"])
+        result_cache = None if config["result_cache_dir"] is None else ResultCache(config["result_cache_dir"])
+        s.holdout_fit_predict(k=config["k"], cache=result_cache)
+        lcs = {
+            data_type: s.get_aperture_lc(data_type=data_type, weighting=config["weighting"], verbose=False)
+            for data_type in config["data_types"]
+        }
+        return {"status": "done", "time": s.time, "lcs": lcs}
+    except Exception:
+        return {"status": "failed", "error": traceback.format_exc(limit=5)}
+
+
+def _write_part(output_dir, finished):
+    """Write the light curves of a batch of finished targets to a new results file and mark them as done.
+
+    The file is written under a temporary name and renamed, and the targets are only marked as done after that,
+    so an interrupted write leaves them to be processed again.
+    """
+    part_name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.npz"
+    sizes = [result["time"].size for _, result in finished]
+    arrays = {
+        "key": np.array([target["key"] for target, _ in finished]),
+        "ra": np.array([target["ra"] for target, _ in finished]),
+        "dec": np.array([target["dec"] for target, _ in finished]),
+        "sector": np.array([target["sector"] for target, _ in finished]),
+        "offsets": np.concatenate([[0], np.cumsum(sizes)]),
+        "time": np.concatenate([result["time"] for _, result in finished]),
+    }
+    for data_type in finished[0][1]["lcs"]:
+        arrays[data_type] = np.concatenate([result["lcs"][data_type] for _, result in finished])
+    tmp_path = os.path.join(output_dir, part_name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, os.path.join(output_dir, part_name))
+    _append_status(output_dir, [dict(key=target["key"], status="done", part=part_name) for target, _ in finished])
+
+
+def _append_status(output_dir, entries):
+    with open(os.path.join(output_dir, STATUS_FILE), "a") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_status(output_dir):
+    """Get the latest status entry (``"done"`` with its results file, or ``"failed"`` with the error) of each target key.
+    """
+    statuses = {}
+    path = os.path.join(output_dir, STATUS_FILE)
+    if not os.path.exists(path):
+        return statuses
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from a killed run.
+                continue
+            statuses[entry["key"]] = entry
+    return statuses
+
+
+def load_results(output_dir):
+    """Read the light curves of the finished targets of a pipeline run.
+
+    Returns:
+        A dictionary mapping each target key to a dictionary with its ``"time"`` and a light curve for each data type.
+    """
+    done = {key: entry["part"] for key, entry in read_status(output_dir).items() if entry["status"] == "done"}
+    results = {}
+    for part_name in sorted(set(done.values())):
+        with np.load(os.path.join(output_dir, part_name)) as part:
+            data_types = [name for name in part.files if name not in ("key", "ra", "dec", "sector", "offsets")]
+            arrays = {name: part[name] for name in data_types}
+            offsets = part["offsets"]
+            for i, key in enumerate(part["key"].tolist()):
+                # A target that was processed again is only read from its latest results file.
+                if done.get(key) != part_name:
+                    continue
+                results[key] = {name: array[offsets[i]:offsets[i + 1]] for name, array in arrays.items()}
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", help="CSV file with ra, dec, sector (and optionally name and size) columns.")
+    parser.add_argument("output_dir", help="Directory for the results. Rerun with the same directory to resume.")
+    parser.add_argument("--size", type=int, default=64, help="Cutout sidelength in pixels.")
+    parser.add_argument("--halfwidth", type=int, default=1, help="Half-width of the square aperture at the cutout center.")
+    parser.add_argument("--regs", type=float, nargs="+", default=None,
+                        help="Regularization of each model component. Default is 0.1 for each.")
+    parser.add_argument("--n", type=int, default=256, help="Number of predictor pixels.")
+    parser.add_argument("--predictor-method", default="similar_brightness")
+    parser.add_argument("--exclusion-size", type=int, default=5)
+    parser.add_argument("--no-poly", action="store_true", help="Do not add a polynomial model.")
+    parser.add_argument("--k", type=int, default=10, help="Number of holdout sections.")
+    parser.add_argument("--data-types", nargs="+", default=["cpm_subtracted_flux"])
+    parser.add_argument("--weighting", default=None)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--cutout-dir", default=None, help="Read the cutouts from this directory instead of MAST.")
+    parser.add_argument("--offline", action="store_true", help="Only use cached cutouts.")
+    parser.add_argument("--result-cache-dir", default=None, help="Cache the fits in this directory and reuse them.")
+    parser.add_argument("--memmap", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100, help="Number of targets per results file.")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--retry-failed", action="store_true", help="Also process the targets that failed before.")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(args)
+
+    if args.regs is None:
+        args.regs = [0.1] if args.no_poly else [0.1, 0.1]
+    pipeline = Pipeline(
+        size=args.size, halfwidth=args.halfwidth, regs=args.regs, n=args.n, predictor_method=args.predictor_method,
+        exclusion_size=args.exclusion_size, poly=not args.no_poly, k=args.k, data_types=args.data_types,
+        weighting=args.weighting, cache_dir=args.cache_dir, cutout_dir=args.cutout_dir, offline=args.offline,
+        result_cache_dir=args.result_cache_dir, memmap=args.memmap, chunk_size=args.chunk_size, batch_size=args.batch_size, processes=args.processes,
+    )
+    num_done, num_failed = pipeline.run(read_targets(args.targets), args.output_dir, args.retry_failed, not args.quiet)
+    print(f"{num_done} targets done, {num_failed} failed.")
+
+
+if __name__ == "__main__":
+    main()
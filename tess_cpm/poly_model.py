@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 from .cutout_data import CutoutData
 
@@ -17,16 +16,17 @@ class PolyModel(object):
         if isinstance(cutout_data, CutoutData):
             self.cutout_data = cutout_data
             self.time = cutout_data.time
-            self.normalized_time = (
+            # Mean Normalization (shared by every polynomial model of the cutout)
+            self.normalized_time = cutout_data.get_design_block(("normalized_time",), lambda: (
                 self.time - (self.time.max() + self.time.min()) / 2
-            ) / (self.time.max() - self.time.min())  # Mean Normalization
+            ) / (self.time.max() - self.time.min()))
 
         self.scale = None
         self.input_vector = None
         self.num_terms = None
         self.m = None
         self.reg = None
-        self.reg_matrix = None
+        self.reg_vector = None
         self.params = None
         self.prediction = None
 
@@ -45,13 +45,25 @@ class PolyModel(object):
 
         """
         self.scale = scale
-        self.input_vector = scale * self.normalized_time
+        self.input_vector = self.cutout_data.get_design_block(("poly_input", scale), lambda: scale * self.normalized_time)
         self.num_terms = num_terms  # With intercept
-        self.m = np.vander(self.input_vector, N=num_terms, increasing=False)  # With intercept
+        # The design matrix only depends on the time, so it is built once and shared by every pixel of the cutout.
+        self.m = self.cutout_data.get_design_block(("poly", scale, num_terms), self._build_m)
         # self.num_terms = num_terms - 1  # Without intercept
         # self.m = np.delete(np.vander(self.input_vector, N=num_terms, increasing=True), 0, 1)  # Without intercept
         # print(self.m)
 
+    def _build_m(self):
+        m = np.vander(self.input_vector, N=self.num_terms, increasing=False)  # With intercept
+        if self.cutout_data.dtype is not None:
+            m = m.astype(self.cutout_data.dtype)
+        return m
+
+    def get_m(self, cadences=slice(None)):
+        """Get rows of the polynomial model design matrix.
+        """
+        return self.m[cadences]
+
     def set_L2_reg(self, reg):
         """Set the L2-regularization for the polynomial model.
 
@@ -60,8 +72,13 @@ class PolyModel(object):
 
         """
         self.reg = reg
-        # self.reg_matrix = reg * np.identity(self.num_terms)
-        self.reg_matrix = np.diag(np.concatenate((np.repeat(reg, self.num_terms-1), np.array([0]))))  # No penalizaing intercept
+        self.reg_vector = np.concatenate((np.repeat(reg, self.num_terms-1), np.array([0.0])))  # No penalizaing intercept
+
+    @property
+    def reg_matrix(self):
+        """The (diagonal) regularization matrix, built from ``reg_vector``.
+        """
+        return None if self.reg_vector is None else np.diag(self.reg_vector)
 
     def predict(self, m=None, params=None, mask=None):
         """Make a prediction for the polynomial model.
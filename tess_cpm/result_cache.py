@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import numpy as np
+
+from .cutout_cache import _index_lock
+
+# The modules whose code determines the fit results. Entries made by a different version of any of them
+# get a different key, so changes to the fitting code invalidate the cache without any manual step.
+_FIT_MODULES = (
+    "cutout_data.py", "background.py", "cpm_model.py", "poly_model.py", "custom_model.py", "model.py", "solvers.py",
+    "source.py", "result_cache.py",
+)
+_code_hash = None
+
+
+class ResultCache(object):
+    """A local on-disk cache of the holdout fits of an aperture, keyed by the content of the inputs.
+
+    The key is a hash of the cutout file's content, the options it was loaded with, every pixel model
+    (row, column, predictor pixels, model components, and regularization), ``k``, the mask, and the code of
+    the fitting modules. The parameters fit for each pixel and section are stored, and the predictions are
+    recomputed from them when loaded, which takes milliseconds. As in ``CutoutCache``, the least recently
+    used entries are evicted once the cache grows beyond ``max_bytes``, the index is only read and updated 
+    while holding a lock on the cache directory (so, e.g., the workers of a ``Pipeline`` can share a cache), 
+    and cached files that are missing from the index are added back when it is read.
+
+    Args:
+        directory (Optional[str]): The cache directory. Default is ``~/.tess_cpm/results``.
+        max_bytes (Optional[int]): The maximum total size of the cached files. Default is no limit.
+    """
+
+    index_name = "index.json"
+
+    def __init__(self, directory=None, max_bytes=None):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".tess_cpm", "results")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, source, k, mask=None):
+        """Get the cache key of the holdout fit of a ``Source``'s aperture.
+        """
+        cutout_data = source.cutout_data
+        h = hashlib.sha256()
+        _hash_update(h, [
+            _get_code_hash(), self.file_hash(cutout_data.file_path), cutout_data.load_options, k, mask,
+            # The chunk size only changes the floating point rounding.
+            [dict(model._get_spec(), chunk_size=None) for row_models in source.models for model in row_models],
+        ])
+        return h.hexdigest()[:32]
+
+    def file_hash(self, path):
+        """Get the hash of a file's content. The hash is kept in the index until the file's size or modification time changes.
+        """
+        stat = os.stat(path)
+        with self._locked():
+            entry = self._load_index().get("files", {}).get(os.path.abspath(path))
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        # The file is hashed without holding the lock.
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(2 ** 20), b""):
+                h.update(block)
+        with self._locked():
+            index = self._load_index()
+            index.setdefault("files", {})[os.path.abspath(path)] = {
+                "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": h.hexdigest()
+            }
+            self._save_index(index)
+        return h.hexdigest()
+
+    def load(self, key):
+        """Get the parameters (pixels, k, d) of a cached holdout fit, or ``None`` if it is not cached.
+        """
+        with self._locked():
+            index = self._load_index()
+            entry = index.setdefault("entries", {}).get(key)
+            path = os.path.join(self.directory, f"{key}.npy")
+            if entry is None or not os.path.exists(path):
+                return None
+            param_matrices = np.load(path)
+            entry["last_access"] = time.time()
+            self._save_index(index)
+        return param_matrices
+
+    def store(self, key, param_matrices):
+        """Store the parameters (pixels, k, d) of a holdout fit.
+        """
+        path = os.path.join(self.directory, f"{key}.npy")
+        # Written to a temporary file first so that other processes never read a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, param_matrices)
+        os.replace(tmp_path, path)
+        with self._locked():
+            index = self._load_index()
+            entries = index.setdefault("entries", {})
+            entries[key] = {"bytes": os.path.getsize(path), "last_access": time.time()}
+            self._evict(entries, keep=(key,))
+            self._save_index(index)
+
+    def _evict(self, entries, keep=()):
+        if self.max_bytes is None:
+            return
+        total = sum(entry["bytes"] for entry in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            total -= entries[key]["bytes"]
+            try:
+                os.remove(os.path.join(self.directory, f"{key}.npy"))
+            except FileNotFoundError:
+                pass
+            del entries[key]
+
+    def clear(self):
+        """Remove every cached fit.
+        """
+        with self._locked():
+            for key in self._load_index().get("entries", {}):
+                try:
+                    os.remove(os.path.join(self.directory, f"{key}.npy"))
+                except FileNotFoundError:
+                    pass
+            self._save_index({})
+
+    @property
+    def size(self):
+        """The total size of the cached files in bytes.
+        """
+        with self._locked():
+            return sum(entry["bytes"] for entry in self._load_index().get("entries", {}).values())
+
+    def _locked(self):
+        return _index_lock(self.directory)
+
+    def _load_index(self):
+        path = os.path.join(self.directory, self.index_name)
+        index = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+        # Add back the cached fits whose index update was lost (e.g., written by a process without the lock).
+        entries = index.setdefault("entries", {})
+        for file_name in os.listdir(self.directory):
+            key, extension = os.path.splitext(file_name)
+            if extension == ".npy" and len(key) == 32 and key not in entries:
+                file_path = os.path.join(self.directory, file_name)
+                entries[key] = {"bytes": os.path.getsize(file_path), "last_access": os.path.getmtime(file_path)}
+        return index
+
+    def _save_index(self, index):
+        # Written to a temporary file first so that other processes never read a partial index.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.directory, self.index_name))
+
+
+def _get_code_hash():
+    global _code_hash
+    if _code_hash is None:
+        h = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in _FIT_MODULES:
+            with open(os.path.join(directory, name), "rb") as f:
+                h.update(f.read())
+        _code_hash = h.hexdigest()
+    return _code_hash
+
+
+def _hash_update(h, value):
+    # Feed a (nested) value into a hash, with the type of each item so that, e.g., 1 and "1" differ.
+    h.update(type(value).__name__.encode())
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        h.update(f"{value.dtype.str}{value.shape}".encode())
+        h.update(value.tobytes())
+    elif isinstance(value, dict):
+        for item_key in sorted(value, key=str):
+            _hash_update(h, item_key)
+            _hash_update(h, value[item_key])
+    elif isinstance(value, (list, tuple)):
+        h.update(str(len(value)).encode())
+        for item in value:
+            _hash_update(h, item)
+    elif value is None or isinstance(value, (bool, int, float, str, np.generic, np.dtype, type)):
+        h.update(repr(value).encode())
+    else:
+        # E.g., a background estimator: its class and attributes.
+        _hash_update(h, type(value))
+        _hash_update(h, vars(value))
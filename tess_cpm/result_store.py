@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class ResultStore(object):
+    """Contiguous storage of the values (light curves) of every pixel model in an aperture.
+
+    The values are kept in a single array with shape (data type, time, rows, cols). Pixel models with
+    an attached store (see ``PixelModel._set_result_store``) write their predictions directly into it,
+    so values for the whole aperture are obtained with vectorized reductions instead of loops over the models.
+
+    Args:
+        time (array): The time of each cadence.
+        num_rows (int): The number of rows in the aperture.
+        num_cols (int): The number of columns in the aperture.
+        dtype (Optional): The data type of the stored values. Default is double precision.
+    """
+
+    data_types = (
+        "raw", "normalized_flux", "cpm_prediction", "poly_model_prediction", "intercept_prediction",
+        "cpm_subtracted_flux", "rescaled_cpm_subtracted_flux",
+    )
+
+    def __init__(self, time, num_rows, num_cols, dtype=None):
+        self.time = time
+        self.values = np.full((len(self.data_types), time.size, num_rows, num_cols), np.nan,
+                              dtype=np.float64 if dtype is None else dtype)
+        # The ``(start, stop)`` index of each holdout section, set after a holdout fit.
+        self.slices = None
+
+    def index(self, data_type):
+        return self.data_types.index(data_type)
+
+    def get(self, data_type):
+        """Get the (time, rows, cols) values of a data type (a view, not a copy).
+        """
+        return self.values[self.index(data_type)]
+
+    def get_split(self, data_type):
+        """Get the values of a data type split into the holdout sections.
+        """
+        values = self.get(data_type)
+        return [values[start:stop] for start, stop in self.slices]
+
+    def pixel_view(self, data_type, row, col):
+        """Get the (time,) values of a data type for a pixel of the aperture.
+        """
+        return self.values[self.index(data_type), :, row, col]
+
+    def aperture_lc(self, data_type, weights=None, split=False):
+        """Sum the light curves over the aperture.
+
+        Args:
+            data_type (str): One of ``data_types``.
+            weights (Optional[array]): The (rows, cols) weight of each pixel. Default is an unweighted sum.
+            split (Optional[bool]): If ``True``, split the light curve into the holdout sections.
+        """
+        values = self.get(data_type)
+        # Summed in double precision regardless of the stored data type.
+        if weights is None:
+            lc = values.sum(axis=(1, 2), dtype=np.float64)
+        else:
+            lc = np.tensordot(values, np.asarray(weights, dtype=np.float64), axes=((1, 2), (0, 1)))
+        if split:
+            return [lc[start:stop] for start, stop in self.slices]
+        return lc
@@ -0,0 +1,414 @@
+import numpy as np
+
+
+def kfold_slices(size, k):
+    """Get the contiguous test sections used for the ``k``-fold holdout fits.
+
+    These are the same sections as ``sklearn.model_selection.KFold(k)`` (without shuffling): the first
+    ``size % k`` sections have one more data point than the rest.
+
+    Args:
+        size (int): The number of data points (cadences).
+        k (int): The number of sections.
+
+    Returns:
+        A list of ``(start, stop)`` tuples, one for each section.
+    """
+    sizes = np.full(k, size // k)
+    sizes[: size % k] += 1
+    stops = np.cumsum(sizes)
+    return [(stop - section_size, stop) for stop, section_size in zip(stops.tolist(), sizes.tolist())]
+
+
+def normal_equations(y, m, reg):
+    """Build the regularized normal equations ``(m.T m + diag(reg)) params = m.T y``.
+
+    Args:
+        y (array): The data (T,).
+        m (array): The design matrix (T, d).
+        reg (array): The (diagonal) regularization (d,).
+
+    Returns:
+        The left-hand side (d, d) and right-hand side (d,) in double precision.
+    """
+    a = np.asarray(np.dot(m.T, m), dtype=float)
+    a[np.diag_indices_from(a)] += reg
+    return a, np.asarray(np.dot(m.T, y), dtype=float)
+
+
+def holdout_normal_equations(y, m, reg, slices, mask=None, downdate=False):
+    """Build the regularized normal equations for each of the holdout training sets.
+
+    For the ``j``-th section, the training set consists of every data point outside of that section
+    (and within ``mask`` if provided).
+
+    Args:
+        y (array): The data (T,), or several data sets (T, r) fit with the same design matrix.
+        m (array): The design matrix (T, d).
+        reg (array): The (diagonal) regularization (d,).
+        slices (list): The ``(start, stop)`` test sections (see ``kfold_slices``).
+        mask (Optional[array]): Boolean array (T,). Only data points where ``mask`` is ``True`` are used to fit.
+        downdate (Optional[bool]): If ``True``, compute ``m.T m`` and ``m.T y`` over the full data set once and
+            obtain each training set's system by subtracting the contribution of its test section. 
+            This replaces ``k`` Gram products over (k-1)/k of the data with roughly two over all of it.
+
+    Returns:
+        The left-hand sides (K, d, d) and right-hand sides (K, d) or (K, d, r) of the normal equations.
+    """
+    if mask is None:
+        mask = np.full(y.shape[0], True)
+    a = np.empty((len(slices), m.shape[1], m.shape[1]))
+    b = np.empty((len(slices), m.shape[1]) + y.shape[1:])
+    if downdate:
+        # Avoid copying the full design matrix when nothing is masked.
+        m_full, y_full = (m, y) if mask.all() else (m[mask], y[mask])
+        a_full, b_full = normal_equations(y_full, m_full, reg)
+        for j, (start, stop) in enumerate(slices):
+            test = mask[start:stop]
+            m_test, y_test = m[start:stop][test], y[start:stop][test]
+            a[j] = a_full - np.dot(m_test.T, m_test)
+            b[j] = b_full - np.dot(m_test.T, y_test)
+        return a, b
+    for j, (start, stop) in enumerate(slices):
+        train = mask.copy()
+        train[start:stop] = False
+        a[j], b[j] = normal_equations(y[train], m[train], reg)
+    return a, b
+
+
+def section_normal_equations(y, m_rows, slices, mask=None, chunk_size=1000):
+    """Accumulate the (unregularized) normal equations of each section from chunks of the design matrix.
+
+    Only ``chunk_size`` rows of the design matrix are held in memory at a time, so the full (T, d) 
+    design matrix never has to be built (e.g., for 200-second cadence or multi-sector light curves).
+
+    Args:
+        y (array): The data (T,) or several data sets (T, r).
+        m_rows (callable): Called with ``(start, stop)`` to get those rows (stop - start, d) of the design matrix.
+        slices (list): The ``(start, stop)`` sections (see ``kfold_slices``).
+        mask (Optional[array]): Boolean array (T,). Only data points where ``mask`` is ``True`` are used.
+        chunk_size (Optional[int]): The maximum number of rows to read at a time.
+
+    Returns:
+        The ``m.T m`` (K, d, d) and ``m.T y`` (K, d) or (K, d, r) of each section in double precision.
+    """
+    a = None
+    for j, (start, stop) in enumerate(slices):
+        for chunk_start in range(start, stop, chunk_size):
+            chunk = slice(chunk_start, min(chunk_start + chunk_size, stop))
+            m = m_rows(chunk.start, chunk.stop)
+            y_chunk = y[chunk]
+            if mask is not None:
+                m, y_chunk = m[mask[chunk]], y_chunk[mask[chunk]]
+            if a is None:
+                a = np.zeros((len(slices), m.shape[1], m.shape[1]))
+                b = np.zeros((len(slices), m.shape[1]) + y.shape[1:])
+            a[j] += np.dot(m.T, m)
+            b[j] += np.dot(m.T, y_chunk)
+    return a, b
+
+
+def chunked_holdout_normal_equations(y, m_rows, reg, slices, mask=None, chunk_size=1000):
+    """Build the regularized normal equations of each holdout training set from chunks of the design matrix.
+
+    This gives the same systems as ``holdout_normal_equations`` (up to floating point rounding), but the 
+    design matrix is read ``chunk_size`` rows at a time (see ``section_normal_equations``). Each training 
+    set's system is the sum of every section's ``m.T m`` and ``m.T y`` minus the held out section's.
+
+    Args:
+        y (array): The data (T,) or several data sets (T, r).
+        m_rows (callable): Called with ``(start, stop)`` to get those rows of the design matrix.
+        reg (array): The (diagonal) regularization (d,).
+        slices (list): The ``(start, stop)`` test sections (see ``kfold_slices``).
+        mask (Optional[array]): Boolean array (T,). Only data points where ``mask`` is ``True`` are used to fit.
+        chunk_size (Optional[int]): The maximum number of rows to read at a time.
+
+    Returns:
+        The left-hand sides (K, d, d) and right-hand sides (K, d) or (K, d, r) of the normal equations.
+    """
+    a_sections, b_sections = section_normal_equations(y, m_rows, slices, mask, chunk_size)
+    a_full = a_sections.sum(axis=0)
+    a_full[np.diag_indices_from(a_full)] += reg
+    return a_full - a_sections, b_sections.sum(axis=0) - b_sections
+
+
+def update_holdout_normal_equations(a, b, y, m, slices, old_mask, new_mask):
+    """Update the holdout normal equations in place after the mask changed.
+
+    The data points added to the mask are added to (and the ones removed are subtracted from) the systems of 
+    the training sets they belong to, so the cost is O(c d^2) for ``c`` changed data points 
+    instead of the O(T d^2) needed to rebuild the systems.
+
+    Args:
+        a (array): The left-hand sides (K, d, d) built with ``old_mask`` (see ``holdout_normal_equations``).
+        b (array): The right-hand sides (K, d) built with ``old_mask``.
+        y (array): The data (T,).
+        m (array): The design matrix (T, d).
+        slices (list): The ``(start, stop)`` test sections (see ``kfold_slices``).
+        old_mask (array): Boolean array (T,) that ``a`` and ``b`` were built with.
+        new_mask (array): Boolean array (T,).
+    """
+    sign = new_mask.astype(float) - old_mask
+    changed = np.flatnonzero(sign)
+    m_changed = np.asarray(m[changed], dtype=float)
+    signed_m_changed = m_changed * sign[changed, None]
+    a_delta = np.dot(signed_m_changed.T, m_changed)
+    b_delta = np.dot(signed_m_changed.T, y[changed])
+    for j, (start, stop) in enumerate(slices):
+        # Changes within the test section do not affect its training set.
+        test = (changed >= start) & (changed < stop)
+        a[j] += a_delta - np.dot(signed_m_changed[test].T, m_changed[test])
+        b[j] += b_delta - np.dot(signed_m_changed[test].T, y[changed[test]])
+
+
+def batched_solve(a, b, return_info=False):
+    """Solve a stack of linear systems with a single call.
+
+    If the stack cannot be solved at once (a system is singular) or some solutions are not finite, 
+    those systems are solved one at a time with ``cholesky_solve`` instead, which falls back to least squares 
+    or gives NaN parameters for the system alone, as the one pixel at a time fits do.
+
+    Args:
+        a (array): The left-hand sides (..., d, d).
+        b (array): The right-hand sides (..., d).
+        return_info (Optional[bool]): If ``True``, also return the ``cholesky_solve`` information of the 
+            systems that were solved one at a time.
+
+    Returns:
+        The solutions (..., d) and, if ``return_info`` is ``True``, a dictionary mapping the (flattened) 
+        index of each system solved one at a time to its information.
+    """
+    try:
+        x = np.linalg.solve(a, b[..., None])[..., 0]
+        resolve = np.flatnonzero(~np.isfinite(x.reshape(-1, x.shape[-1])).all(axis=1))
+    except np.linalg.LinAlgError:
+        x = np.empty(b.shape)
+        resolve = np.arange(x.size // x.shape[-1])
+    infos = {}
+    if resolve.size:
+        a_flat, b_flat, x_flat = a.reshape((-1,) + a.shape[-2:]), b.reshape(-1, b.shape[-1]), x.reshape(-1, x.shape[-1])
+        for i in resolve:
+            x_flat[i], infos[int(i)] = cholesky_solve(a_flat[i], b_flat[i])
+    if return_info:
+        return x, infos
+    return x
+
+
+def cholesky_solve(a, b, condition=False):
+    """Solve a regularized normal equations system, which is symmetric positive definite, with a Cholesky factorization.
+
+    If the factorization fails (e.g., ``a`` is singular because a parameter is unregularized and its column 
+    is degenerate), the system is solved in the least squares sense instead. Systems with non-finite
+    values give NaN parameters.
+
+    Args:
+        a (array): The left-hand side (d, d).
+        b (array): The right-hand side (d,) or sides (d, r).
+        condition (Optional[bool]): If ``True``, estimate the (1-norm) condition number of ``a`` from the 
+            Cholesky factor. This costs O(d^2), compared to the O(d^3) SVD of ``np.linalg.cond``.
+
+    Returns:
+        The solution (d,) or (d, r) and a dictionary with the ``"solver"`` used ("cholesky", "lstsq", or "none"),
+        the estimated ``"condition_number"`` (if requested and the factorization succeeded), 
+        and the ``"reason"`` for falling back (if it did).
+    """
+    from scipy.linalg import cho_factor, cho_solve, LinAlgError
+    from scipy.linalg.lapack import dpocon
+
+    info = {"solver": "cholesky"}
+    try:
+        factor = cho_factor(a)
+    except (LinAlgError, ValueError) as err:
+        info["reason"] = str(err)
+        if np.isfinite(a).all() and np.isfinite(b).all():
+            info["solver"] = "lstsq"
+            return np.linalg.lstsq(a, b, rcond=None)[0], info
+        info["solver"] = "none"
+        return np.full(b.shape, np.nan), info
+    if condition:
+        rcond, _ = dpocon(factor[0], np.abs(a).sum(axis=0).max(), uplo="L" if factor[1] else "U")
+        info["condition_number"] = np.inf if rcond == 0 else 1 / rcond
+    # The factor is finite, so only the right-hand sides with non-finite values give NaN parameters.
+    return cho_solve(factor, b, check_finite=False), info
+
+
+def ridge_solve(y, m, reg, form="auto", condition=False):
+    """Solve the ridge regression ``min ||y - m params||^2 + params.T diag(reg) params`` in the primal or dual form.
+
+    The primal form solves the (d, d) normal equations ``(m.T m + diag(reg)) params = m.T y``, which costs 
+    O(T d^2 + d^3). The dual (kernel) form solves a (T, T) system instead, which costs O(d T^2 + T^3), 
+    so it is cheaper when there are more parameters than data points (e.g., thousands of predictor pixels).
+    Parameters with zero regularization (e.g., the polynomial model intercept) are supported in both forms.
+    In the dual form, they are solved for with generalized least squares using the kernel matrix
+    ``K = m_s diag(1/reg_s) m_s.T + I`` of the regularized columns ``s``. Both forms give the same solution.
+
+    Args:
+        y (array): The data (T,).
+        m (array): The design matrix (T, d).
+        reg (array): The (diagonal) regularization (d,). Entries must be nonnegative.
+        form (Optional[str]): "primal", "dual", or "auto" to pick the cheaper form (dual when d > T).
+        condition (Optional[bool]): If ``True``, estimate the condition number of the factorized system
+            (see ``cholesky_solve``).
+
+    Returns:
+        The solution (d,) and the information dictionary from ``cholesky_solve`` with the ``"form"`` used.
+    """
+    if form == "auto":
+        # Comparing T d^2 + d^3/3 to d T^2 + T^3/3 reduces to comparing d to T.
+        form = "dual" if m.shape[1] > m.shape[0] else "primal"
+    if form == "primal":
+        a, b = normal_equations(y, m, reg)
+        params, info = cholesky_solve(a, b, condition)
+    elif form == "dual":
+        params, info = _dual_ridge_solve(y, m, np.asarray(reg, dtype=float), condition)
+    else:
+        raise ValueError(f"Unknown form {form}. Use 'primal', 'dual', or 'auto'.")
+    info["form"] = form
+    return params, info
+
+
+def _dual_ridge_solve(y, m, reg, condition=False):
+    swept = reg > 0
+    fixed = ~swept
+    m_s = m[:, swept]
+    kernel = np.asarray(np.dot(m_s / reg[swept], m_s.T), dtype=float)
+    kernel[np.diag_indices_from(kernel)] += 1
+    m_f = np.asarray(m[:, fixed], dtype=float)
+    # Columns hold (K^-1 y | K^-1 m_f)
+    k_inv, info = cholesky_solve(kernel, np.column_stack((y, m_f)), condition)
+    params = np.empty(m.shape[1])
+    residual = k_inv[:, 0]
+    if fixed.any():
+        params_f, _ = cholesky_solve(np.dot(m_f.T, k_inv[:, 1:]), np.dot(m_f.T, k_inv[:, 0]))
+        params[fixed] = params_f
+        residual = residual - np.dot(k_inv[:, 1:], params_f)
+    # The regularized parameters are diag(1/reg_s) m_s.T K^-1 (y - m_f params_f)
+    params[swept] = np.dot(m_s.T, residual) / reg[swept]
+    return params, info
+
+
+def holdout_reg_path(y, m, reg, swept, regs, slices, mask=None):
+    """Solve the holdout fits for a whole grid of regularization values at once.
+
+    The regularization of the ``swept`` parameters (e.g., the CPM coefficients) is set to each value in ``regs``
+    while the remaining parameters keep the regularization given in ``reg`` (which may be zero, 
+    as for the unpenalized intercept of the polynomial model). For each section, the remaining parameters
+    are eliminated with a Schur complement and the resulting symmetric matrix is eigendecomposed once, 
+    after which the solution for any regularization value only costs a few matrix-vector products.
+
+    Args:
+        y (array): The data (T,).
+        m (array): The design matrix (T, d).
+        reg (array): The (diagonal) regularization (d,). Entries for the ``swept`` parameters are ignored.
+        swept (array): Boolean array (d,) specifying the parameters whose regularization is varied.
+        regs (array): The regularization values (L,).
+        slices (list): The ``(start, stop)`` test sections (see ``kfold_slices``).
+        mask (Optional[array]): Boolean array (T,). Only data points where ``mask`` is ``True`` are used to fit.
+
+    Returns:
+        The parameters (L, K, d) for each regularization value and section.
+    """
+    fixed_reg = np.array(reg, dtype=float)
+    fixed_reg[swept] = 0
+    a, b = holdout_normal_equations(y, m, fixed_reg, slices, mask, downdate=True)
+    return _holdout_reg_path(a, b, swept, regs)
+
+
+def chunked_holdout_reg_path(y, m_rows, reg, swept, regs, slices, mask=None, chunk_size=1000):
+    """Solve the holdout fits for a grid of regularization values, reading the design matrix in chunks.
+
+    This gives the same parameters as ``holdout_reg_path`` (up to floating point rounding), but the 
+    holdout systems are accumulated ``chunk_size`` rows at a time (see ``chunked_holdout_normal_equations``).
+
+    Args:
+        y (array): The data (T,).
+        m_rows (callable): Called with ``(start, stop)`` to get those rows of the design matrix.
+        reg (array): The (diagonal) regularization (d,). Entries for the ``swept`` parameters are ignored.
+        swept (array): Boolean array (d,) specifying the parameters whose regularization is varied.
+        regs (array): The regularization values (L,).
+        slices (list): The ``(start, stop)`` test sections (see ``kfold_slices``).
+        mask (Optional[array]): Boolean array (T,). Only data points where ``mask`` is ``True`` are used to fit.
+        chunk_size (Optional[int]): The maximum number of rows to read at a time.
+
+    Returns:
+        The parameters (L, K, d) for each regularization value and section.
+    """
+    fixed_reg = np.array(reg, dtype=float)
+    fixed_reg[swept] = 0
+    a, b = chunked_holdout_normal_equations(y, m_rows, fixed_reg, slices, mask, chunk_size)
+    return _holdout_reg_path(a, b, swept, regs)
+
+
+def _holdout_reg_path(a, b, swept, regs):
+    # Solve the (K, d, d) holdout systems, built without the regularization of the swept parameters, for each value.
+    regs = np.atleast_1d(regs)
+    fixed = ~swept
+    path = np.empty((regs.size,) + b.shape)
+    for j in range(len(a)):
+        a_ss = a[j][np.ix_(swept, swept)]
+        b_s = b[j][swept]
+        if fixed.any():
+            a_sf = a[j][np.ix_(swept, fixed)]
+            a_ff = a[j][np.ix_(fixed, fixed)]
+            # Columns hold (a_ff^-1 a_fs | a_ff^-1 b_f)
+            c = np.linalg.solve(a_ff, np.column_stack((a_sf.T, b[j][fixed])))
+            a_ss = a_ss - np.dot(a_sf, c[:, :-1])
+            b_s = b_s - np.dot(a_sf, c[:, -1])
+        eigvals, eigvecs = np.linalg.eigh(a_ss)
+        params_s = np.dot(np.dot(eigvecs.T, b_s) / (eigvals + regs[:, None]), eigvecs.T)
+        path[:, j][:, swept] = params_s
+        if fixed.any():
+            path[:, j][:, fixed] = c[:, -1] - np.dot(params_s, c[:, :-1].T)
+    return path
+
+
+def cv_reg_path(y, m, reg, swept, regs, mask=None):
+    """Get the exact leave-one-out and generalized cross-validation errors for a grid of regularization values.
+
+    As in ``holdout_reg_path``, the regularization of the ``swept`` parameters is set to each value in ``regs``
+    while the remaining parameters keep the regularization given in ``reg``. With the remaining parameters 
+    eliminated, the hat matrix is ``H = (I - W) + W m_s (S + reg I)^-1 m_s.T W``, where 
+    ``W = I - m_f (m_f.T m_f + diag(reg_f))^-1 m_f.T`` and ``S = m_s.T W m_s``. ``S`` is eigendecomposed once, 
+    after which the fitted values and the diagonal of ``H`` (and so both errors) for any regularization value
+    only cost matrix-vector products.
+
+    Args:
+        y (array): The data (T,).
+        m (array): The design matrix (T, d).
+        reg (array): The (diagonal) regularization (d,). Entries for the ``swept`` parameters are ignored.
+        swept (array): Boolean array (d,) specifying the parameters whose regularization is varied.
+        regs (array): The regularization values (L,).
+        mask (Optional[array]): Boolean array (T,). Only data points where ``mask`` is ``True`` are used.
+
+    Returns:
+        The mean squared leave-one-out errors (L,) and the generalized cross-validation errors (L,).
+    """
+    regs = np.atleast_1d(regs)
+    if mask is not None:
+        y, m = y[mask], m[mask]
+    y = np.asarray(y, dtype=float)
+    m = np.asarray(m, dtype=float)
+    fixed = ~swept
+    m_s, m_f = m[:, swept], m[:, fixed]
+    if fixed.any():
+        g = np.dot(m_f.T, m_f)
+        g[np.diag_indices_from(g)] += np.asarray(reg, dtype=float)[fixed]
+        # Columns hold (g^-1 m_f.T m_s | g^-1 m_f.T y)
+        c = np.linalg.solve(g, np.dot(m_f.T, np.column_stack((m_s, y))))
+        w_m_s = m_s - np.dot(m_f, c[:, :-1])
+        w_y = y - np.dot(m_f, c[:, -1])
+        fixed_fit = y - w_y  # (I - W) y
+        fixed_leverage = np.sum(np.linalg.solve(g, m_f.T).T * m_f, axis=1)  # diag(I - W)
+    else:
+        w_m_s, w_y = m_s, y
+        fixed_fit, fixed_leverage = np.zeros_like(y), np.zeros_like(y)
+    eigvals, eigvecs = np.linalg.eigh(np.dot(m_s.T, w_m_s))
+    u = np.dot(w_m_s, eigvecs)  # W m_s V
+    proj = np.dot(u.T, y)
+    weights = 1 / (eigvals + regs[:, None])  # (L, n)
+    fitted = fixed_fit + np.dot(weights * proj, u.T)  # (L, T)
+    leverage = fixed_leverage + np.dot(weights, (u ** 2).T)  # (L, T)
+    residuals = y - fitted
+    loo = np.mean((residuals / (1 - leverage)) ** 2, axis=1)
+    gcv = np.mean(residuals ** 2, axis=1) / (1 - np.mean(leverage, axis=1)) ** 2
+    return loo, gcv
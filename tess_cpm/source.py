@@ -1,14 +1,20 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import lightkurve as lk
-from scipy.ndimage import median_filter
-from matplotlib.ticker import MaxNLocator
 
 from .cutout_data import CutoutData
-from .model import PixelModel
+from .cutout_cache import CutoutCache
+from .model import PixelModel, _shared_holdout_fit
+from .result_store import ResultStore
+from .outliers import sigma_clip
 from .cpm_model import CPM
 from .poly_model import PolyModel
+from .solvers import (
+    kfold_slices, holdout_normal_equations, chunked_holdout_normal_equations, batched_solve, cholesky_solve
+)
+from . import instrumentation
 
 
 class Source(object):
@@ -17,13 +23,14 @@ class Source(object):
     """
 
     def __init__(self, path, remove_bad=True, verbose=True, 
-                 provenance='TessCut', quality=None, bkg_subtract=False, bkg_n=100):
+                 provenance='TessCut', quality=None, bkg_subtract=False, bkg_n=100, memmap=False, dtype=None):
         self.provenance = provenance
         self.cutout_data = CutoutData(path, remove_bad, verbose, 
-                                      self.provenance, quality, bkg_subtract, bkg_n)
+                                      self.provenance, quality, bkg_subtract, bkg_n, memmap, dtype)
         self.time = self.cutout_data.time
         self.aperture = None
         self.models = None
+        self.shared_predictors = False
         self.fluxes = None
         self.predictions = None
         self.detrended_lcs = None
@@ -31,22 +38,53 @@ class Source(object):
         self.split_predictions = None
         self.split_fluxes = None
         self.split_detrended_lcs = None
+        self.results = None
 
+    @classmethod
+    def from_cache(cls, ra, dec, sector, size=64, cache=None, **kwargs):
+        """Create a Source from a cutout in a ``CutoutCache`` (fetching it first if needed).
 
-    def set_aperture(self, rowlims=[49, 51], collims=[49, 51]):
+        Args:
+            ra (float): Right ascension in degrees.
+            dec (float): Declination in degrees.
+            sector (int): The sector.
+            size (Optional[int]): The cutout sidelength in pixels.
+            cache (Optional[CutoutCache]): The cache to use. Default is ``CutoutCache()``.
+            **kwargs: Passed to ``Source``.
+        """
+        if cache is None:
+            cache = CutoutCache()
+        return cls(cache.get(ra, dec, size=size, sector=sector)[0], **kwargs)
+
+    def set_aperture(self, rowlims=[49, 51], collims=[49, 51], chunk_size=None):
+        """Set the aperture and create a pixel model for each pixel in it.
+
+        Args:
+            rowlims (Optional[list]): The first and last row of the aperture.
+            collims (Optional[list]): The first and last column of the aperture.
+            chunk_size (Optional[int]): If set, the pixel models process the light curves ``chunk_size`` 
+                cadences at a time instead of building their design matrices (see ``PixelModel``). 
+                Combine with ``memmap=True`` to bound the memory used by long (e.g., 200-second cadence) cutouts.
+        """
         self.models = []
         self.fluxes = []
-        apt = np.full(self.cutout_data.fluxes[0].shape, False)
+        self.shared_predictors = False
+        apt = np.full(self.cutout_data.flux_medians.shape, False)
         # print("Assuming you're interested in the central set of pixels")
         apt[rowlims[0]:rowlims[1]+1, collims[0]:collims[1]+1] = True
 
         self.aperture = apt
+        # The values of every pixel model are written into a single (data type, time, rows, cols) array.
+        # The pixel models' values are copied into it after each fit, unless they are views into it (``copy=False``).
+        self.results = ResultStore(self.time, rowlims[1]+1-rowlims[0], collims[1]+1-collims[0], self.cutout_data.dtype)
         for row in range(rowlims[0], rowlims[1]+1):
             row_models = []
             row_fluxes = []
             for col in range(collims[0], collims[1]+1):
-                row_models.append(PixelModel(self.cutout_data, row, col))
-                row_fluxes.append(self.cutout_data.normalized_fluxes[:, row, col])
+                model = PixelModel(self.cutout_data, row, col, chunk_size)
+                model._set_result_store(self.results, row - rowlims[0], col - collims[0])
+                row_models.append(model)
+                row_fluxes.append(model.norm_flux)
             self.models.append(row_models)
             self.fluxes.append(row_fluxes)
 
@@ -54,12 +92,45 @@ class Source(object):
         exclusion_method="closest",
         n=256,
         predictor_method="similar_brightness",
-        seed=None):
+        seed=None,
+        shared=False):
+        """Add a CPM component to the model of every pixel in the aperture.
+
+        Args:
+            exclusion_size (Optional[int]): The size of the exclusion region (see ``CPM.set_exclusion``).
+            exclusion_method (Optional): The method for excluding a region (see ``CPM.set_exclusion``).
+            n (Optional[int]): Number of predictor pixels to use.
+            predictor_method (Optional): The method for choosing predictor pixels (see ``CPM.set_predictor_pixels``).
+            seed (Optional[int]): The seed for the "random" method.
+            shared (Optional[bool]): If ``True``, every aperture pixel uses the same predictor pixels, chosen 
+                outside the union of the pixels' exclusion regions (see ``CutoutData.get_shared_predictor_idx``). 
+                The pixels then share one design matrix, and ``holdout_fit_predict`` solves all of them together 
+                with one factorization per section, so the fit cost barely grows with the aperture size.
+        """
         if self.models is None:
             print("Please set the aperture first.")
+        # The predictor pixels for every aperture pixel are chosen at once.
+        rows = np.array([model.row for row_models in self.models for model in row_models])
+        cols = np.array([model.col for row_models in self.models for model in row_models])
+        with instrumentation.stage("predictor_selection", num_pixels=rows.size, shared=shared):
+            if shared:
+                predictor_idx = repeat(self.cutout_data.get_shared_predictor_idx(
+                    rows, cols, n, predictor_method, exclusion_size, exclusion_method, seed
+                ))
+            else:
+                predictor_idx = iter(self.cutout_data.get_predictor_idx(
+                    rows, cols, n, predictor_method, exclusion_size, exclusion_method, seed
+                ))
+        first = self.models[0][0]
         for row_models in self.models:
             for model in row_models:
-                model.add_cpm_model(exclusion_size, exclusion_method, n, predictor_method, seed)
+                model.add_cpm_model(exclusion_size, exclusion_method, n, predictor_method, seed, 
+                                    predictor_idx=next(predictor_idx))
+                if shared and model is not first and model.cpm.m is not None:
+                    # Only one copy of the predictor light curves is kept for the aperture.
+                    model.cpm.m = first.cpm.m
+                    model.cpm.normalized_predictor_pixels_fluxes = first.cpm.m
+        self.shared_predictors = shared
 
     def remove_cpm_model(self):
         if self.models is None:
@@ -67,6 +138,7 @@ class Source(object):
         for row_models in self.models:
             for model in row_models:
                 model.remove_cpm_model()
+        self.shared_predictors = False
 
     def add_poly_model(self, scale=2, num_terms=4):
         if self.models is None:
@@ -92,15 +164,74 @@ class Source(object):
     def set_regs(self, regs=[], verbose=False):
         if self.models is None:
                 print("Please set the aperture first.")
+        first = self.models[0][0]
         for row_models in self.models:
             for model in row_models:
                 model.set_regs(regs, verbose)
+                if self.shared_predictors and model is not first and model.design_matrix is not None:
+                    # With shared predictors the design matrices are identical, so only one is kept.
+                    model.design_matrix = first.design_matrix
+                    model.cpm.m = first.cpm.m
+                    model.cpm.normalized_predictor_pixels_fluxes = first.cpm.m
+
+    def holdout_fit_predict(self, k=10, mask=None, verbose=False, batched=False, downdate=False, processes=None,
+                            incremental=False, cache=None, copy=True):
+        """Perform the ``k``-fold holdout fit and prediction for every pixel in the aperture.
+
+        Args:
+            k (Optional[int]): The number of sections to split the light curve into.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+            verbose (Optional[bool]): If ``True``, print information about each fit.
+            batched (Optional[bool]): If ``True``, the normal equations for every aperture pixel and section are 
+                stacked and solved with a single batched call instead of one pixel and one section at a time.
+                This requires every pixel model to have the same number of parameters.
+            downdate (Optional[bool]): If ``True``, each training set's normal equations are obtained by 
+                subtracting the held out section's contribution from the full data ``m.T m`` and ``m.T y``.
+            processes (Optional[int]): If set, fit the pixel models in this many worker processes. The cutout 
+                data is published once with ``CutoutData.share()`` and each worker fits on a read-only view of it.
+            incremental (Optional[bool]): If ``True``, each pixel model keeps its training sets' normal equations 
+                and later incremental calls with a different ``mask`` only update them for the data points that 
+                changed (see ``PixelModel.holdout_normal_equations``). Ignored with ``processes``, since the 
+                normal equations are built in the worker processes.
+            cache (Optional[ResultCache]): If set, load the fit parameters from this cache if the same fit (same cutout 
+                content, pixel models, ``k``, and ``mask``) was cached before, and otherwise cache them after fitting.
+            copy (Optional[bool]): If ``False``, the pixel models' prediction attributes (and the returned predictions) 
+                are views into ``results`` instead of arrays of their own (see ``PixelModel.holdout_predict``). 
+                This saves an allocation per pixel and data type, but the next fit overwrites them in place.
 
-    def holdout_fit_predict(self, k=10, mask=None, verbose=False):
+        With shared predictors (see ``add_cpm_model``) and the same regularization for every pixel, all the 
+        aperture pixels are fit together as the right-hand sides of one system per section, and ``batched``, 
+        ``downdate``, ``processes``, and ``incremental`` are ignored.
+
+        Returns:
+            The split times, fluxes, and predictions of every pixel.
+        """
         if self.models is None:
             print("Please set the aperture first.")
-        if mask is not None:
+        if mask is not None and verbose:
             print(f"Using user-provided mask. Clipping {np.sum(~mask)} points.")  # pylint: disable=invalid-unary-operand-type 
+        loaded = False
+        if cache is not None:
+            cache_key = cache.key(self, k, mask)
+            param_matrices = cache.load(cache_key)
+            loaded = param_matrices is not None
+            instrumentation.count("result_cache_hits" if loaded else "result_cache_misses")
+            if loaded:
+                slices = kfold_slices(self.time.size, k)
+                models = [model for row_models in self.models for model in row_models]
+                for model, param_matrix in zip(models, param_matrices):
+                    model.holdout_predict(param_matrix, slices, copy)
+        shared = self.shared_predictors and all(
+            np.array_equal(model.reg_vector, self.models[0][0].reg_vector) for row_models in self.models for model in row_models
+        )
+        if loaded:
+            pass
+        elif shared:
+            self._shared_holdout_fit(k, mask, copy)
+        elif processes is not None:
+            self._parallel_holdout_fit(k, mask, downdate, processes, copy)
+        elif batched:
+            self._batched_holdout_fit(k, mask, downdate, incremental, copy)
         predictions = []
         fluxes = []
         detrended_lcs = []
@@ -109,7 +240,12 @@ class Source(object):
             row_fluxes = []
             # row_detrended_lcs = []
             for model in row_models:
-                times, flux, pred = model.holdout_fit_predict(k, mask, verbose=verbose)
+                if loaded or shared or batched or processes is not None:
+                    times, flux, pred = model.split_time, model.split_fluxes, model.split_prediction
+                else:
+                    times, flux, pred = model.holdout_fit_predict(
+                        k, mask, verbose=verbose, downdate=downdate, incremental=incremental, copy=copy
+                    )
                 row_fluxes.append(flux)
                 row_predictions.append(pred)
                 # row_detrended_lcs.append(flux - pred)
@@ -121,9 +257,74 @@ class Source(object):
         self.split_predictions = predictions
         self.split_detrended_lcs = detrended_lcs
         self.rescale()
+        if cache is not None and not loaded:
+            cache.store(cache_key, np.stack([model.param_matrix for row_models in self.models for model in row_models]))
         return (times, fluxes, predictions)
 
+    def _batched_holdout_fit(self, k, mask=None, downdate=False, incremental=False, copy=True):
+        models = [model for row_models in self.models for model in row_models]
+        slices = kfold_slices(self.time.size, k)
+        with instrumentation.stage("solve", num_pixels=len(models)):
+            if incremental or any(mod.design_matrix is None for mod in models):
+                systems = [mod.holdout_normal_equations(k, mask, incremental) for mod in models]
+            else:
+                systems = [holdout_normal_equations(mod.norm_flux, mod.design_matrix, mod.reg_vector, slices, mask, downdate) 
+                           for mod in models]
+            a = np.stack([system[0] for system in systems])
+            b = np.stack([system[1] for system in systems])
+            num_params = a.shape[-1]
+            # All (pixels x sections) systems are solved at once as a (P*K, d, d) stack. A singular system 
+            # is solved on its own (see ``batched_solve``), so it does not stop the fit of the other pixels.
+            param_matrices, infos = batched_solve(
+                a.reshape(-1, num_params, num_params), b.reshape(-1, num_params), return_info=True
+            )
+            param_matrices = param_matrices.reshape(len(models), len(slices), num_params)
+        instrumentation.count("solves", len(models) * len(slices))
+        for i, info in infos.items():
+            if "reason" in info:
+                model = models[i // len(slices)]
+                instrumentation.record("solver_fallback", solver=info["solver"], reason=info["reason"], 
+                                       row=model.row, col=model.col, section=i % len(slices))
+        for model, param_matrix in zip(models, param_matrices):
+            model.holdout_predict(param_matrix, slices, copy)
+
+    def _shared_holdout_fit(self, k, mask=None, copy=True):
+        models = [model for row_models in self.models for model in row_models]
+        slices = kfold_slices(self.time.size, k)
+        first = models[0]
+        with instrumentation.stage("solve", num_pixels=len(models), shared=True):
+            # The light curves of the aperture are the (T, pixels) right-hand sides of the same design matrix.
+            y = np.stack([mod.norm_flux for mod in models], axis=1)
+            if first.design_matrix is None:
+                a, b = chunked_holdout_normal_equations(
+                    y, first._design_matrix_rows, first.reg_vector, slices, mask, first.chunk_size
+                )
+            else:
+                a, b = holdout_normal_equations(y, first.design_matrix, first.reg_vector, slices, mask, downdate=True)
+            param_matrices = np.empty((len(slices), a.shape[-1], len(models)))
+            for j in range(len(slices)):
+                param_matrices[j] = cholesky_solve(a[j], b[j])[0]
+        instrumentation.count("solves", len(slices), num_pixels=len(models))
+        for model, param_matrix in zip(models, param_matrices.transpose(2, 0, 1)):
+            model.holdout_predict(param_matrix, slices, copy)
+
+    def _parallel_holdout_fit(self, k, mask=None, downdate=False, processes=None, copy=True):
+        models = [model for row_models in self.models for model in row_models]
+        slices = kfold_slices(self.time.size, k)
+        with instrumentation.stage("solve", num_pixels=len(models), processes=processes):
+            with self.cutout_data.share() as shared_cutout_data:
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    param_matrices = list(executor.map(
+                        _shared_holdout_fit, repeat(shared_cutout_data), [mod._get_spec() for mod in models],
+                        repeat(k), repeat(mask), repeat(downdate)
+                    ))
+        instrumentation.count("solves", len(models) * len(slices))
+        for model, param_matrix in zip(models, param_matrices):
+            model.holdout_predict(param_matrix, slices, copy)
+
     def plot_cutout(self, rowlims=None, collims=None, l=10, h=90, show_aperture=False, projection=None):
+        import matplotlib.pyplot as plt
+
         if rowlims is None:
             rows = [0, self.cutout_data.cutout_sidelength_x]
         else:
@@ -161,28 +362,30 @@ class Source(object):
     def plot_pixel(self, row=None, col=None, loc=None):
         """Plot the data (light curve) for a specified pixel.
         """
-        flux = self.cutout_data.fluxes[:, row, col]
+        import matplotlib.pyplot as plt
+
+        flux = self.cutout_data.get_pixel_data("fluxes", row, col)
         plt.plot(self.cutout_data.time, flux, ".")
 
     def plot_pix_by_pix(self, data_type="raw", split=False, show_locations=True,
                         show_labels=True, fontsize=15, figsize=(12, 8), thin=1, marker=".", ms=1,
                         yaxis_nbins=6, ylabel_xloc = 0.065, zeroing=False):
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MaxNLocator
+
         rows = np.arange(len(self.models))
         cols = np.arange(len(self.models[0]))
         fig, axs = plt.subplots(rows.size, cols.size, sharex=True, sharey=True, figsize=figsize, squeeze=False)
         for r in rows:
             for c in cols:
                 ax = axs[rows[-1] - r, c]  # Needed to flip the rows so that they match origin='lower' setting
+                y = self.results.pixel_view(data_type, r, c)
+                if (data_type == "cpm_subtracted_flux") & (zeroing == True):
+                    y = y - self.results.pixel_view("intercept_prediction", r, c)
                 if split:
-                    yy = self.models[r][c].split_values_dict[data_type]
-                    if (data_type == "cpm_subtracted_flux") & (zeroing == True):
-                        yy = yy - self.models[r][c].split_values_dict["intercept_prediction"] 
-                    for time, y in zip(self.split_times, yy):
-                        ax.plot(time[::thin], y[::thin], marker, ms=ms)
+                    for start, stop in self.results.slices:
+                        ax.plot(self.time[start:stop][::thin], y[start:stop][::thin], marker, ms=ms)
                 else:
-                    y = self.models[r][c].values_dict[data_type]
-                    if (data_type == "cpm_subtracted_flux") & (zeroing == True):
-                        y = y - self.models[r][c].values_dict["intercept_prediction"] 
                     ax.plot(self.time[::thin], y[::thin], marker, ms=ms, color='k')
                 if show_locations:
                     ax.text(x=0.98, y=0.98, s=f"[{self.models[r][c].row},{self.models[r][c].col}]", 
@@ -202,16 +405,86 @@ class Source(object):
         return fig, axs
 
     def get_lc_matrix(self, data_type="cpm_subtracted_flux"):
-        rows = np.arange(len(self.models))
-        cols = np.arange(len(self.models[0]))
-        lc_matrix = np.zeros((self.time.size, rows.size, cols.size))
-        for r in rows:
-            for c in cols:
-                y = self.models[r][c].values_dict[data_type]
-                lc_matrix[:, rows[-1] - r, c] = y
-        return lc_matrix
+        # The rows are flipped to match the orientation of the images.
+        return np.array(self.results.get(data_type)[:, ::-1, :], dtype=float)
     
+    def detrend_cutout(self, output_dir, regs, tile_size=10, data_types=("cpm_subtracted_flux",), k=10, mask=None, 
+                       cpm_kwargs=None, poly_kwargs=None, rowlims=None, collims=None, verbose=True):
+        """Detrend every pixel of the cutout, streaming the results into memory-mapped ``.npy`` cubes.
+
+        The cutout is processed in square tiles of pixels. For each tile, the usual ``set_aperture``, ``add_cpm_model``, 
+        (``add_poly_model``), ``set_regs``, and batched ``holdout_fit_predict`` steps are run and the requested 
+        values are written into the output cubes before moving on, so memory use is set by the tile size rather 
+        than the cutout size. Use ``memmap=True`` when creating the ``Source`` to also avoid holding the input cubes.
+        The current aperture and models are discarded.
+
+        Args:
+            output_dir (str): The directory to write ``<data_type>.npy`` (with shape (time, rows, cols)) and ``time.npy`` to.
+            regs (list): The regularization values passed to ``set_regs``.
+            tile_size (Optional[int]): The sidelength of the tiles of pixels fit at a time.
+            data_types (Optional[tuple]): The values to save, e.g., "cpm_subtracted_flux", "cpm_prediction",
+                or "rescaled_cpm_subtracted_flux" (see ``PixelModel.values_dict``).
+            k (Optional[int]): The number of sections passed to ``holdout_fit_predict``.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+            cpm_kwargs (Optional[dict]): Keyword arguments passed to ``add_cpm_model``.
+            poly_kwargs (Optional[dict]): Keyword arguments passed to ``add_poly_model``. If ``None``, no polynomial model is used.
+            rowlims (Optional[list]): Only detrend these (inclusive) rows. The default is every row.
+            collims (Optional[list]): Only detrend these (inclusive) columns. The default is every column.
+            verbose (Optional[bool]): If ``True``, print the progress and throughput after each tile.
+
+        Returns:
+            A dictionary of the (memory-mapped) output cubes for each data type.
+        """
+        if rowlims is None:
+            rowlims = [0, self.cutout_data.cutout_sidelength_x - 1]
+        if collims is None:
+            collims = [0, self.cutout_data.cutout_sidelength_y - 1]
+        os.makedirs(output_dir, exist_ok=True)
+        np.save(os.path.join(output_dir, "time.npy"), self.time)
+        shape = (self.time.size, self.cutout_data.cutout_sidelength_x, self.cutout_data.cutout_sidelength_y)
+        cubes = {
+            data_type: np.lib.format.open_memmap(os.path.join(output_dir, f"{data_type}.npy"), mode="w+", shape=shape)
+            for data_type in data_types
+        }
+        for cube in cubes.values():
+            cube[:] = np.nan
+
+        tiles = [
+            ([row, min(row + tile_size - 1, rowlims[1])], [col, min(col + tile_size - 1, collims[1])])
+            for row in range(rowlims[0], rowlims[1] + 1, tile_size)
+            for col in range(collims[0], collims[1] + 1, tile_size)
+        ]
+        num_pixels = (rowlims[1] + 1 - rowlims[0]) * (collims[1] + 1 - collims[0])
+        done = 0
+        start = time.perf_counter()
+        for i, (tile_rowlims, tile_collims) in enumerate(tiles):
+            self.set_aperture(rowlims=tile_rowlims, collims=tile_collims)
+            self.add_cpm_model(**(cpm_kwargs or {}))
+            if poly_kwargs is not None:
+                self.add_poly_model(**poly_kwargs)
+            self.set_regs(regs)
+            self.holdout_fit_predict(k, mask, batched=True, copy=False)
+            rows = slice(tile_rowlims[0], tile_rowlims[1] + 1)
+            cols = slice(tile_collims[0], tile_collims[1] + 1)
+            for data_type, cube in cubes.items():
+                cube[:, rows, cols] = self.results.get(data_type)
+            done += len(self.models) * len(self.models[0])
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"Tile {i+1}/{len(tiles)}: {done}/{num_pixels} pixels done "
+                      f"({done / elapsed:.1f} pixels/s, {elapsed:.1f} s elapsed)")
+        for cube in cubes.values():
+            cube.flush()
+        self.aperture = None
+        self.models = None
+        self.fluxes = None
+        self.results = None
+        return cubes
+
     def make_animation(self, data_type="cpm_subtracted_flux", l=0, h=100, thin=5):
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+
         lc_matrix = self.get_lc_matrix(data_type=data_type)
         fig, axes = plt.subplots(1, 1, figsize=(12, 12))
         ims = []
@@ -229,61 +502,73 @@ class Source(object):
             for mod in rowmod:
                 mod.rescale()
 
-    def get_outliers(self, data_type="cpm_subtracted_flux", window=50, sigma=5, sigma_upper=None, sigma_lower=None):
-        lc = self.get_aperture_lc(data_type=data_type, verbose=False)
-        if sigma_upper is None:
-            sigma_upper = sigma
-        if sigma_lower is None:
-            sigma_lower = sigma
-        median_lc = median_filter(lc, size=window)
-        median_subtracted_lc = lc - median_lc
-        outliers = np.full(lc.shape, False)
-        while True:
-            std = np.std(median_subtracted_lc)
-            clipped_upper = median_subtracted_lc > sigma_upper*std
-            clipped_lower = median_subtracted_lc < -sigma_lower*std  # pylint: disable=invalid-unary-operand-type
-            out = clipped_upper + clipped_lower
-            if np.sum(out) == np.sum(outliers):
-                break
-            outliers += out
-        return outliers
+    def get_outliers(self, data_type="cpm_subtracted_flux", window=50, sigma=5, sigma_upper=None, sigma_lower=None, 
+                     maxiters=10, per_pixel=False):
+        """Find the outliers of the aperture light curve (or of each pixel) by sigma clipping around a rolling median.
 
-    def get_aperture_lc(self, data_type="raw", weighting=None, split=False, verbose=True):
-        rows = np.arange(len(self.models))
-        cols = np.arange(len(self.models[0]))
-        if verbose:
-            print(f"Summing over {rows.size} x {cols.size} pixel lightcurves. Weighting={weighting}")
-        if split:
-            aperture_lc = np.zeros_like(self.split_times, dtype=object)
+        See ``outliers.sigma_clip`` for details. To find the outliers of a detrended cube 
+        (e.g., from ``detrend_cutout``), call ``sigma_clip`` on the cube directly.
+
+        Args:
+            data_type (Optional[str]): The values to use (see ``get_aperture_lc``).
+            window (Optional[int]): The number of data points in the rolling median window.
+            sigma (Optional[float]): The number of standard deviations to clip at.
+            sigma_upper (Optional[float]): The number of standard deviations above the median to clip at. Default is ``sigma``.
+            sigma_lower (Optional[float]): The number of standard deviations below the median to clip at. Default is ``sigma``.
+            maxiters (Optional[int]): The maximum number of clipping iterations.
+            per_pixel (Optional[bool]): If ``True``, find the outliers of each pixel's light curve separately.
+
+        Returns:
+            Boolean array that is ``True`` for the outliers, with shape (time,) or (time, rows, cols) if ``per_pixel``.
+        """
+        if per_pixel:
+            lc = self.results.get(data_type)
         else:
-            aperture_lc = np.zeros_like(self.time)
-        medvals = np.zeros((len(rows), len(cols)))
-        for r in rows:
-            for c in cols:
-                medvals[r][c] = self.models[r][c].cpm.target_median
-        medvals /= np.nansum(medvals)
-        for r in rows:
-            for c in cols:
-                if weighting == "median":
-                    weight = medvals[r][c]
-                elif weighting == None:
-                    weight = 1.0
-                if split:
-                    aperture_lc += weight*self.models[r][c].split_values_dict[data_type]
-                else:
-                    aperture_lc += weight*self.models[r][c].values_dict[data_type]
+            lc = self.get_aperture_lc(data_type=data_type, verbose=False)
+        return sigma_clip(lc, window, sigma, sigma_upper, sigma_lower, maxiters)
 
-        return aperture_lc
+    def get_aperture_lc(self, data_type="raw", weighting=None, split=False, verbose=True):
+        num_rows, num_cols = len(self.models), len(self.models[0])
+        if verbose:
+            print(f"Summing over {num_rows} x {num_cols} pixel lightcurves. Weighting={weighting}")
+        weights = None
+        if weighting == "median":
+            medvals = self.cutout_data.flux_medians[self.aperture].reshape(num_rows, num_cols)
+            weights = medvals / np.nansum(medvals)
+        return self.results.aperture_lc(data_type, weights, split)
 
     def _calc_cdpp(self, flux, **kwargs):
+        import lightkurve as lk
+
         return lk.TessLightCurve(flux=flux+1).estimate_cdpp(**kwargs)
 
-    def calc_min_cpm_reg(self, cpm_regs, k, mask=None, **kwargs):
+    def calc_min_cpm_reg(self, cpm_regs, k, mask=None, path=False, **kwargs):
+        """Find the CPM regularization value that minimizes the section average CDPP of the aperture light curve.
+
+        Args:
+            cpm_regs (array): The CPM regularization values to try.
+            k (int): The number of sections to split the light curve into.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used to fit.
+            path (Optional[bool]): If ``True``, solve for every value at once with ``PixelModel.holdout_reg_path``
+                instead of calling ``set_regs`` and ``holdout_fit_predict`` for each value. 
+                The regularizations of the other model components are taken from the last ``set_regs`` call
+                and the fitted models are left unchanged.
+            **kwargs: Passed to ``lightkurve.TessLightCurve.estimate_cdpp``.
+        """
+        import matplotlib.pyplot as plt
+
         cdpps = np.zeros((cpm_regs.size, k))
+        if path:
+            apt_cpm_subtracted_lcs = self._cpm_reg_path_aperture_lcs(cpm_regs, k, mask)
+            if apt_cpm_subtracted_lcs is None:
+                return
         for idx, reg in enumerate(cpm_regs):
-            self.set_regs([reg])
-            self.holdout_fit_predict(k, mask)
-            apt_cpm_subtracted_lc = self.get_aperture_lc(split=True, data_type="cpm_subtracted_flux", verbose=False)
+            if path:
+                apt_cpm_subtracted_lc = apt_cpm_subtracted_lcs[idx]
+            else:
+                self.set_regs([reg])
+                self.holdout_fit_predict(k, mask)
+                apt_cpm_subtracted_lc = self.get_aperture_lc(split=True, data_type="cpm_subtracted_flux", verbose=False)
             split_cdpp = np.array([self._calc_cdpp(flux, **kwargs) for flux in apt_cpm_subtracted_lc])
             cdpps[idx] = split_cdpp
         section_avg_cdpps = np.average(cdpps, axis=1)
@@ -316,6 +601,66 @@ class Source(object):
         # axs[2].legend()
         return (min_cpm_reg, cdpps)
 
+    def select_cpm_reg(self, cpm_regs, criterion="loo", mask=None, per_pixel=False, set_regs=False):
+        """Find the CPM regularization value(s) that minimize the leave-one-out or generalized cross-validation error.
+
+        Unlike ``calc_min_cpm_reg``, this does not refit the models for each value: the errors for every
+        value are obtained in closed form from a single eigendecomposition per pixel (see ``PixelModel.cv_reg_path``).
+        The regularizations of the other model components are taken from the last ``set_regs`` call.
+
+        Args:
+            cpm_regs (array): The CPM regularization values to try.
+            criterion (Optional[str]): "loo" for the leave-one-out error or "gcv" for the generalized cross-validation error.
+            mask (Optional[array]): Boolean array. Data points where ``mask`` is ``False`` are not used.
+            per_pixel (Optional[bool]): If ``True``, select a value for each pixel. Otherwise, select the single value
+                that minimizes the errors summed over the aperture (of the normalized pixel light curves).
+            set_regs (Optional[bool]): If ``True``, set the CPM regularization of each pixel model to the selected value.
+                Run ``holdout_fit_predict`` afterwards to refit.
+
+        Returns:
+            The selected value (or a (rows, cols) array of values if ``per_pixel``) and the errors (rows, cols, len(cpm_regs)).
+        """
+        if self.models is None:
+            print("Please set the aperture first.")
+            return
+        cpm_regs = np.atleast_1d(cpm_regs)
+        errors = np.empty((len(self.models), len(self.models[0]), cpm_regs.size))
+        for r, row_models in enumerate(self.models):
+            for c, model in enumerate(row_models):
+                result = model.select_cpm_reg(cpm_regs, criterion, mask)
+                if result is None:
+                    # The pixel model printed what is missing.
+                    return
+                errors[r, c] = result[1]
+        if per_pixel:
+            selected = cpm_regs[np.argmin(errors, axis=-1)]
+        else:
+            selected = cpm_regs[np.argmin(errors.sum(axis=(0, 1)))]
+        if set_regs:
+            for r, row_models in enumerate(self.models):
+                for c, model in enumerate(row_models):
+                    reg = selected[r, c] if per_pixel else selected
+                    model.set_regs([float(reg)] + list(model.regs[1:]), verbose=False)
+        return selected, errors
+
+    def _cpm_reg_path_aperture_lcs(self, cpm_regs, k, mask=None):
+        slices = kfold_slices(self.time.size, k)
+        apt_lcs = np.zeros((cpm_regs.size, self.time.size))
+        for row_models in self.models:
+            for model in row_models:
+                param_path = model.holdout_reg_path(cpm_regs, k, mask)
+                if param_path is None:
+                    # The pixel model printed what is missing.
+                    return
+                n = model.cpm.num_predictor_pixels
+                for j, (start, stop) in enumerate(slices):
+                    # With ``chunk_size``, the design matrix is not built, so its rows are read chunk by chunk.
+                    for chunk_start, chunk_stop, m in model._iter_design_matrix(start, stop):
+                        apt_lcs[:, chunk_start:chunk_stop] += (
+                            model.norm_flux[chunk_start:chunk_stop] - np.dot(param_path[:, j, :n], m[:, :n].T)
+                        )
+        return [[apt_lc[start:stop] for start, stop in slices] for apt_lc in apt_lcs]
+
     # def _lsq(self, y, m, reg_matrix, mask=None):
     #     if mask is not None:
     #         m = m[~mask]
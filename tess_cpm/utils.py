@@ -1,17 +1,35 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from astropy import units as u
-from astropy.coordinates import SkyCoord
-from astroquery.mast import Tesscut
 
 
-def get_data(ra, dec, units="deg", size=64):
-    c = SkyCoord(ra, dec, units=units)
-    data_table = Tesscut.download_cutouts(c, size=size)
-    return data_table
+def get_data(ra, dec, units="deg", size=64, sector=None, cache=None):
+    """Get TESS cutouts around the given coordinates.
+
+    Args:
+        ra (float): Right ascension.
+        dec (float): Declination.
+        units (Optional[str]): The units of the coordinates.
+        size (Optional[int]): The cutout sidelength in pixels.
+        sector (Optional[int]): Only get this sector. The default is every sector.
+        cache (Optional[CutoutCache]): If passed, the cutouts are taken from (and added to) this cache
+            instead of always being downloaded into the working directory.
+
+    Returns:
+        A table whose ``Local Path`` column contains the paths to the cutouts.
+    """
+    from astropy.coordinates import SkyCoord
+    from astropy.table import Table
+    from astroquery.mast import Tesscut
+
+    c = SkyCoord(ra, dec, unit=units)
+    if cache is None:
+        data_table = Tesscut.download_cutouts(coordinates=c, size=size, sector=sector)
+        return data_table
+    return Table({"Local Path": cache.get(c.ra.deg, c.dec.deg, size=size, sector=sector)})
 
 
 def plot_lightcurves(cpm):
+    import matplotlib.pyplot as plt
+
     fig, axs = plt.subplots(2, 1, figsize=(18, 12))
     data = cpm.target_fluxes
     model = cpm.lsq_prediction
@@ -59,6 +77,8 @@ def summary_plot(cpm, n=20, subtract_polynomials=False, save=False):
     are the pixels which have the highest absolute coefficient values calculated when ``lsq`` is run.   
 
     """
+    import matplotlib.pyplot as plt
+
     top_n_loc, top_n_mask = cpm.get_contributing_pixels(n)
 
     plt.figure(figsize=(18, 14))
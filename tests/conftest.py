@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import tess_cpm  # noqa: E402
+from synthetic import make_tesscut_file  # noqa: E402
+
+# The fast paths only reorder floating point operations, so they match the plain fits up to rounding.
+RTOL = 1e-10
+ATOL = 1e-10
+
+
+@pytest.fixture(scope="session")
+def cutout_path(tmp_path_factory):
+    return make_tesscut_file(str(tmp_path_factory.mktemp("cutout")), size=30, num_cadences=400)
+
+
+def make_source(path, chunk_size=None, shared=False, regs=(0.1, 0.1), n=32):
+    """Fit a 3x3 aperture at the center of the synthetic cutout with the plain per-pixel holdout fits."""
+    s = tess_cpm.Source(path, verbose=False)
+    s.set_aperture(rowlims=[14, 16], collims=[14, 16], chunk_size=chunk_size)
+    s.add_cpm_model(n=n, shared=shared)
+    s.add_poly_model()
+    s.set_regs(list(regs))
+    return s
+
+
+def assert_matches(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=RTOL, atol=ATOL)
@@ -0,0 +1,107 @@
+import numpy as np
+
+from tess_cpm import instrumentation
+from tess_cpm.solvers import kfold_slices
+
+from conftest import make_source, assert_matches
+
+
+def test_batched_matches_per_pixel(cutout_path):
+    s = make_source(cutout_path)
+    s.holdout_fit_predict(k=5)
+    expected = s.results.values.copy()
+    s.holdout_fit_predict(k=5, batched=True)
+    assert_matches(s.results.values, expected)
+
+
+def test_batched_singular_pixel_falls_back(cutout_path):
+    s = make_source(cutout_path)
+    s.holdout_fit_predict(k=5)
+    expected = s.results.values.copy()
+    # An unregularized all-zero column makes the systems of the central pixel singular.
+    model = s.models[1][1]
+    model.reg_vector = np.zeros_like(model.reg_vector)
+    model.design_matrix = model.design_matrix.copy()
+    model.design_matrix[:, 1] = 0
+    collector = instrumentation.ListCollector()
+    instrumentation.set_collector(collector)
+    try:
+        s.holdout_fit_predict(k=5, batched=True)
+    finally:
+        instrumentation.set_collector(None)
+    fallbacks = [record for record in collector.records if record["event"] == "solver_fallback"]
+    assert len(fallbacks) == 5
+    assert all((record["row"], record["col"]) == (15, 15) for record in fallbacks)
+    others = np.full((3, 3), True)
+    others[1, 1] = False
+    assert_matches(s.results.values[..., others], expected[..., others])
+    assert np.isfinite(s.results.get("cpm_prediction")[:, 1, 1]).all()
+
+
+def test_downdate_matches_per_pixel(cutout_path):
+    s = make_source(cutout_path)
+    s.holdout_fit_predict(k=5)
+    expected = s.results.values.copy()
+    s.holdout_fit_predict(k=5, downdate=True)
+    assert_matches(s.results.values, expected)
+    s.holdout_fit_predict(k=5, batched=True, downdate=True)
+    assert_matches(s.results.values, expected)
+
+
+def test_dual_matches_primal(cutout_path):
+    model = make_source(cutout_path).models[1][1]
+    slices = kfold_slices(model.time.size, 5)
+    model.holdout_predict(model.holdout_fit(k=5, verbose=False, form="primal")[-1], slices)
+    expected = model.cpm_subtracted_flux
+    model.holdout_predict(model.holdout_fit(k=5, verbose=False, form="dual")[-1], slices)
+    assert_matches(model.cpm_subtracted_flux, expected)
+
+
+def test_incremental_matches_per_pixel(cutout_path):
+    s = make_source(cutout_path)
+    rng = np.random.default_rng(0)
+    mask = np.full(s.time.size, True)
+    collector = instrumentation.ListCollector()
+    instrumentation.set_collector(collector)
+    try:
+        for _ in range(3):
+            # The first fit builds the systems, and the later ones update them for the changed cadences.
+            s.holdout_fit_predict(k=5, mask=mask, incremental=True)
+            incremental = s.results.values.copy()
+            s.holdout_fit_predict(k=5, mask=mask)
+            assert_matches(incremental, s.results.values)
+            mask = mask.copy()
+            mask[rng.choice(s.time.size, 10, replace=False)] ^= True
+    finally:
+        instrumentation.set_collector(None)
+    assert collector.summary()["counters"]["incremental_updates"] == 2 * 9
+
+
+def test_chunked_matches_per_pixel(cutout_path):
+    s = make_source(cutout_path)
+    s.holdout_fit_predict(k=5)
+    expected = s.results.values.copy()
+    for batched in (False, True):
+        # The chunks do not line up with the sections.
+        chunked = make_source(cutout_path, chunk_size=37)
+        assert chunked.models[1][1].design_matrix is None
+        chunked.holdout_fit_predict(k=5, batched=batched)
+        assert_matches(chunked.results.values, expected)
+
+
+def test_shared_predictors_match_per_pixel(cutout_path):
+    for chunk_size in (None, 37):
+        s = make_source(cutout_path, chunk_size=chunk_size, shared=True)
+        collector = instrumentation.ListCollector()
+        instrumentation.set_collector(collector)
+        try:
+            s.holdout_fit_predict(k=5)
+        finally:
+            instrumentation.set_collector(None)
+        # One multi-right-hand-side solve per section for the whole aperture.
+        assert collector.summary()["counters"]["solves"] == 5
+        shared = s.results.values.copy()
+        # The same predictor pixels, fit one pixel at a time.
+        s.shared_predictors = False
+        s.holdout_fit_predict(k=5)
+        assert_matches(shared, s.results.values)
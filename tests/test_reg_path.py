@@ -0,0 +1,41 @@
+import numpy as np
+
+from conftest import make_source, assert_matches
+
+CPM_REGS = np.array([0.01, 1.0, 100.0])
+
+
+def test_holdout_reg_path_matches_holdout_fits(cutout_path):
+    s = make_source(cutout_path)
+    path = s.models[1][1].holdout_reg_path(CPM_REGS, k=5)
+    lcs = s._cpm_reg_path_aperture_lcs(CPM_REGS, k=5)
+    for cpm_reg, params, split_lc in zip(CPM_REGS, path, lcs):
+        s.set_regs([cpm_reg, 0.1])
+        s.holdout_fit_predict(k=5)
+        assert_matches(params, s.models[1][1].param_matrix)
+        expected = s.get_aperture_lc(split=True, data_type="cpm_subtracted_flux", verbose=False)
+        assert_matches(np.concatenate(split_lc), np.concatenate(expected))
+
+
+def test_cv_reg_path_matches_leave_one_out_fits(cutout_path):
+    s = make_source(cutout_path)
+    model = s.models[1][1]
+    loo, gcv = model.cv_reg_path(CPM_REGS)
+    m = model.design_matrix
+    for cpm_reg, loo_error, gcv_error in zip(CPM_REGS, loo, gcv):
+        model.set_regs([cpm_reg, 0.1])
+        # The k = T holdout fit leaves out one cadence at a time.
+        model.holdout_fit_predict(k=model.time.size)
+        assert_matches(loo_error, np.mean((model.norm_flux - model.prediction) ** 2))
+        hat = np.dot(m, np.linalg.solve(np.dot(m.T, m) + model.reg_matrix, m.T))
+        residuals = model.norm_flux - np.dot(hat, model.norm_flux)
+        assert_matches(gcv_error, np.mean(residuals ** 2) / (1 - np.trace(hat) / model.time.size) ** 2)
+
+
+def test_chunked_reg_path_matches_reg_path(cutout_path):
+    s = make_source(cutout_path)
+    chunked = make_source(cutout_path, chunk_size=37)
+    assert_matches(chunked.models[1][1].holdout_reg_path(CPM_REGS, k=5), s.models[1][1].holdout_reg_path(CPM_REGS, k=5))
+    for split_lc, expected in zip(chunked._cpm_reg_path_aperture_lcs(CPM_REGS, k=5), 
+                                  s._cpm_reg_path_aperture_lcs(CPM_REGS, k=5)):
+        assert_matches(np.concatenate(split_lc), np.concatenate(expected))